@@ -12,17 +12,38 @@ from glob import glob
 import platform
 
 platform_os = platform.system()
-if platform_os == 'Windows':
-	if path.isdir(path.normpath( 'C:/Program Files/Lumerical')):
-		dirc = min([path.normpath(x) for x in glob('c:/Program Files/Lumerical'+'/*')])
-		sys.path.append( path.normpath( dirc + '\\api\\python\\' ) )
-	else:
-		raise Exception( 'ERROR: Cannot find Windows Lumerical API directory!' )
-elif platform_os == 'Linux':
-	dir = '/opt/lumerical/'
-	if path.isdir(dir):
-		topdir = next(os.walk(dir))[1]
-		sys.path.append(dir + topdir[0] + '/api/python/')
-	else:
-		raise Exception('ERROR: Cannot find Linux Lumerical API directory!' )
-import lumapi
\ No newline at end of file
+if os.environ.get('PYLUM_LUMAPI') == 'fake':
+	# local stand-in backend, no Lumerical install needed
+	from . import fakelumapi as lumapi
+	sys.modules['lumapi'] = lumapi
+else:
+	lumapi_error = None
+	if platform_os == 'Windows':
+		if path.isdir(path.normpath( 'C:/Program Files/Lumerical')):
+			dirc = min([path.normpath(x) for x in glob('c:/Program Files/Lumerical'+'/*')])
+			sys.path.append( path.normpath( dirc + '\\api\\python\\' ) )
+		else:
+			lumapi_error = 'ERROR: Cannot find Windows Lumerical API directory!'
+	elif platform_os == 'Linux':
+		dir = '/opt/lumerical/'
+		if path.isdir(dir):
+			topdir = next(os.walk(dir))[1]
+			sys.path.append(dir + topdir[0] + '/api/python/')
+		else:
+			lumapi_error = 'ERROR: Cannot find Linux Lumerical API directory!'
+	if lumapi_error is None:
+		try:
+			import lumapi
+		except ImportError as e:
+			lumapi_error = 'ERROR: Cannot import the Lumerical API: %s' % e
+	if lumapi_error is not None:
+		# stand-in so that the local tools (localmode, material.indexmodels,
+		# tools) work without Lumerical; opening a session raises
+		import types
+		from .fakelumapi import LumApiError
+		def _unavailable(*args, **kwargs):
+			raise RuntimeError(lumapi_error)
+		lumapi = types.ModuleType('lumapi', 'Lumerical API (not available)')
+		lumapi.LumApiError = LumApiError
+		lumapi.MODE = lumapi.FDTD = _unavailable
+		sys.modules['lumapi'] = lumapi
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Purpose:    Persistent, content-addressed cache of FDE mode solutions.
+            Entries are keyed by a hash of everything setup_sim and solve_mode
+            send to the solver (recorded component layout, materials, mesh
+            settings, boundary conditions, temperature, wavelength, mode
+            selection) and stored as one .npz file each.  The cache is kept
+            below max_bytes by evicting the least recently used entries.
+Usage:
+            cache = ResultCache("~/.pylum_cache", max_bytes=20e9)
+            sim = FDEModeSimulation(component, cache=cache)
+            sim.setup_sim(wavl)
+            data = sim.solve_mode(wavl)  # no solver session is started on a hit
+Copyright:  (c) 2021 David Heydari
+"""
+import os
+
+import numpy as np
+from .sweeps.journal import save_npz, spec_hash
+
+class ResultCache:
+    version = 2  # bump when the stored data or the key contents change
+
+    def __init__(self, path, max_bytes=10e9):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, spec):
+        return spec_hash(dict(spec, version=self.version))
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def get(self, key, dtype=None):
+        """The stored FDEModeSimData, fields cast to dtype (e.g. the
+        simulation's field_dtype) if given; None on a miss."""
+        from .fdemode import FDEModeSimData
+        try:
+            with np.load(self._file(key)) as f:
+                p = dict((k, f[k]) for k in f.files)
+        except (OSError, ValueError, EOFError):  # missing or half-written entry
+            self.misses += 1
+            return None
+        os.utime(self._file(key))  # mark as recently used
+        self.hits += 1
+        return FDEModeSimData.from_fields(p["xaxis"], p["yaxis"], p["index"], p["wavl"].item(),
+            p["fields"], p["n_grp"].item(), p["n_eff"].item(), p["loss"].item(), dtype=dtype)
+
+    def put(self, key, data):
+        save_npz(self._file(key), xaxis=data.xaxis, yaxis=data.yaxis, index=data.index,
+            wavl=data.wavl, fields=np.asarray(data.fields), n_grp=data.n_grps, n_eff=data.n_effs, loss=data.loss)
+        self.evict()
+
+    def entries(self):  # (last use, size, file), least recently used first
+        out = []
+        for s in os.listdir(self.path):
+            if s.endswith(".npz"):
+                try:
+                    st = os.stat(os.path.join(self.path, s))
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, os.path.join(self.path, s)))
+        return sorted(out)
+
+    @property
+    def size(self):
+        return sum(e[1] for e in self.entries())
+
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for mtime, size, f in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        self.evict(0)
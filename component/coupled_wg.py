@@ -17,6 +17,8 @@ Example of material_params argument:
 
 from .ridge_wg import Waveguide
 from .ridge_wg import RidgeWaveguide
+from .script import batched
+from .layout import incremental
 
 class CoupledWaveguide:
     def __init__(self, gap, gap_etch, width_l, width_r, 
@@ -29,9 +31,13 @@ class CoupledWaveguide:
         self.right_wg = Waveguide(width_r, self.height, etch_r)
 
 class CoupledRidgeWaveguide:
-    def __init__(self, coupled_wg, material_params, hideGUI=True):
+    def __init__(self, coupled_wg, material_params, hideGUI=True, batch=False,
+                incremental=False):
         self.wg = coupled_wg
         self.material_params = material_params
+        self.batch = batch  # emit produce_component as one LSF script
+        self.incremental = incremental  # only send what changed since the last build
+        self.layout = None
 
     def _create_ridges(self, program, wavl, cap_thickness, subs_thickness):
         left = RidgeWaveguide(self.wg.left_wg, self.material_params)
@@ -100,6 +106,8 @@ class CoupledRidgeWaveguide:
         program.selectall()
         program.addtogroup(name)
 
+    @incremental
+    @batched
     def produce_component(self, program, wavl, x_core, name, 
                             cap_thickness, subs_thickness):
         self._create_ridges(program, wavl, cap_thickness, subs_thickness)
@@ -18,7 +18,8 @@ Copyright:      (c) August 2020 David Heydari
 import math
 import lumapi
 from collections import OrderedDict
-from pylum.material import materials
+from pylum.material import dielectrics as materials
+from .script import LumScript
 
 # TODO: use regex to simplify the code
 
@@ -29,11 +30,26 @@ class GratingEnvironment:
         ('core_mat', materials.silicon_nasa),
         ('cap_mat', materials.silica),
         ])
-    def __init__(self, core_thickness, hideGUI=True):
-        self.fdtd = lumapi.FDTD(hide=hideGUI)
+    def __init__(self, core_thickness, hideGUI=True, batch=False, pool=None):
+        self.pool = pool  # pylum.session.SessionPool handing out warm sessions
+        self.fdtd = lumapi.FDTD(hide=hideGUI) if pool is None else pool.acquire()
         self.h_total = core_thickness
+        self.batch = batch  # emit produce_environment as one LSF script
         materials.make_Si_nasa(self.fdtd)
 
+    def close(self):
+        if self.fdtd is None:
+            return
+        if self.pool is not None:
+            self.pool.release(self.fdtd)
+        else:
+            self.fdtd.close()
+        self.fdtd = None
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
     def _create_substrate(self):  # run first
         self.fdtd.addrect()
         self.fdtd.set("name", "substrate")
@@ -164,7 +180,15 @@ class GratingEnvironment:
 
     def produce_environment(self, pitch, etch_depth, grating_length, dc, 
             z_span=50e-6, input_length=20e-6, output_length=40e-6, subs_thickness=50e-6, bottom_clad_thickness=2e-6, top_clad_thickness=1e-6):
-        self.fdtd.deleteall()
-        self.create_structures(pitch, etch_depth, grating_length, dc, 
-            z_span, input_length, output_length, subs_thickness, bottom_clad_thickness, top_clad_thickness)
-        self._set_group_material()
\ No newline at end of file
+        fdtd = self.fdtd
+        if self.batch:
+            self.fdtd = LumScript(fdtd)
+        try:
+            self.fdtd.deleteall()
+            self.create_structures(pitch, etch_depth, grating_length, dc, 
+                z_span, input_length, output_length, subs_thickness, bottom_clad_thickness, top_clad_thickness)
+            self._set_group_material()
+            if self.batch:
+                self.fdtd.flush()
+        finally:
+            self.fdtd = fdtd
\ No newline at end of file
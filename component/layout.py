@@ -0,0 +1,248 @@
+"""
+Purpose:    Declarative description of the layout a component builds in a
+            Lumerical(R) session.  A Layout accepts the same layout commands as
+            a solver (addrect, set, setnamed, select, addtogroup, ...) and keeps
+            the resulting objects, groups and the properties set on them.
+            Components built with incremental=True record their new layout,
+            diff it against the one that is live in the session and only send
+            the properties that changed, instead of deleteall + rebuild.
+            A recorded layout can also be rasterized: the material at any point
+            of the xy cross-section, resolving overlaps by mesh order as the
+            solver does.
+Copyright:  (c) 2021 David Heydari
+"""
+import functools
+import numbers
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from .script import LumScript
+
+def normalize(value):  # the solver stores booleans and integers as doubles
+    if isinstance(value, str):
+        return value
+    if isinstance(value, numbers.Real) or hasattr(value, "dtype"):
+        return float(value)
+    return value
+
+_GEOMETRY = dict([(a + s, (a, s)) for a in "xyz" for s in ("", " span", " min", " max")])
+
+class LayoutObject:
+    def __init__(self, name, kind, parent=None):
+        self.props = OrderedDict([("name", name)])  # properties as set, in order
+        self.kind = kind
+        self.parent = parent
+        self.bounds = dict([(axis, [-0.5e-6, 0.5e-6]) for axis in "xyz"])
+
+    @property
+    def name(self):
+        return self.props["name"]
+
+    @property
+    def path(self):
+        if self.parent is None:
+            return self.name
+        return self.parent.path + "::" + self.name
+
+    def set(self, prop, value):
+        value = normalize(value)
+        self.props[prop] = value
+        if prop not in _GEOMETRY or self.kind == "Group":
+            return
+        axis, part = _GEOMETRY[prop]  # center, span, min and max stay consistent
+        lo, hi = self.bounds[axis]
+        if part == "":
+            lo, hi = value - (hi - lo)/2, value + (hi - lo)/2
+        elif part == " span":
+            lo, hi = (lo + hi)/2 - value/2, (lo + hi)/2 + value/2
+        elif part == " min":
+            lo = value
+        else:
+            hi = value
+        self.bounds[axis] = [lo, hi]
+
+    def get(self, prop):
+        if prop in _GEOMETRY and self.kind != "Group":
+            axis, part = _GEOMETRY[prop]
+            lo, hi = self.bounds[axis]
+            return {"": (lo + hi)/2, " span": hi - lo, " min": lo, " max": hi}[part]
+        return self.props[prop]
+
+class Layout:
+    recorder = True  # not a live solver session
+
+    def __init__(self):
+        self.objects = []
+        self.selection = []
+        self.cleared = False  # built from an empty session (deleteall first)
+
+    def _find(self, name):
+        found = [obj for obj in self.objects if obj.path == name]
+        if not found:
+            raise KeyError("There is no object named " + name)
+        return found
+
+    def _add(self, name, kind):
+        obj = LayoutObject(name, kind)
+        self.objects.append(obj)
+        self.selection = [obj]
+        return obj
+
+    def switchtolayout(self):
+        pass
+    def deleteall(self):
+        self.objects = []
+        self.selection = []
+        self.cleared = True
+    def addrect(self):
+        self._add("rectangle", "Rectangle")
+    def addmesh(self):
+        self._add("mesh", "Mesh")
+    def addfde(self):
+        self._add("FDE", "FDE")
+    def addfdtd(self):
+        self._add("FDTD", "FDTD")
+    def addpower(self):
+        self._add("DFT", "DFT")
+
+    def select(self, name):
+        self.selection = [obj for obj in self.objects if obj.path == name]
+    def shiftselect(self, name):
+        self.selection += [obj for obj in self.objects
+            if obj.path == name and obj not in self.selection]
+    def selectall(self):
+        self.selection = [obj for obj in self.objects if obj.parent is None]
+
+    def addtogroup(self, name):
+        groups = [obj for obj in self.objects if obj.path == name and obj.kind == "Group"]
+        group = groups[0] if groups else LayoutObject(name, "Group")
+        if not groups:
+            self.objects.append(group)
+        for obj in self.selection:
+            if obj is not group:
+                obj.parent = group
+        self.selection = [group]
+
+    def set(self, prop, value):
+        if not self.selection:
+            raise KeyError("No object is selected")
+        for obj in self.selection:
+            obj.set(prop, value)
+    def setnamed(self, name, prop, value):
+        for obj in self._find(name):
+            obj.set(prop, value)
+    def getnamed(self, name, prop):
+        return self._find(name)[0].get(prop)
+    def getnamednumber(self, name):
+        return float(len([obj for obj in self.objects if obj.path == name]))
+
+    def describe(self):
+        return [(obj.path, obj.kind, OrderedDict(obj.props)) for obj in self.objects]
+
+    def diff(self, live):
+        """Returns the (name, property, value) updates that turn the live
+        layout into this one, or None if the two differ in structure."""
+        if [(o.path, o.kind) for o in self.objects] != [(o.path, o.kind) for o in live.objects]:
+            return None
+        changes = []
+        for new, old in zip(self.objects, live.objects):
+            if set(old.props) - set(new.props):
+                return None
+            changes += [(new.path, prop, value) for prop, value in new.props.items()
+                if old.props.get(prop) != value]
+        return changes
+
+    def _enabled(self, obj):
+        while obj is not None:
+            if not obj.props.get("enabled", 1.0):
+                return False
+            obj = obj.parent
+        return True
+
+    def rectangles(self):
+        """(x bounds, y bounds, material) of the enabled rectangles, highest
+        precedence first: lowest mesh order (2 unless overridden, 1 for etch),
+        later objects winning ties."""
+        rects = []
+        for i, obj in enumerate(self.objects):
+            if obj.kind != "Rectangle" or not self._enabled(obj):
+                continue
+            material = obj.props.get("material")
+            if obj.props.get("override mesh order from material database"):
+                order = obj.props.get("mesh order", 2.0)
+            else:
+                order = 1.0 if material == "etch" else 2.0
+            rects.append((order, -i, tuple(obj.bounds["x"]), tuple(obj.bounds["y"]), material))
+        rects.sort()
+        return [(x, y, material) for order, i, x, y, material in rects]
+
+    def rasterize(self, x, y):
+        """Material at the points (x, y) (broadcasting arrays); None where
+        there is no rectangle (background)."""
+        x, y = np.broadcast_arrays(x, y)
+        out = np.full(x.shape, None, dtype=object)
+        for (x0, x1), (y0, y1), material in reversed(self.rectangles()):
+            out[(x0 <= x) & (x <= x1) & (y0 <= y) & (y <= y1)] = material
+        return out
+
+_live = weakref.WeakKeyDictionary()  # solver session -> Layout it currently holds
+
+def live_layout(program):
+    try:
+        return _live.get(program)
+    except TypeError:
+        return None
+
+def set_live_layout(program, layout):
+    try:
+        if layout is None:
+            _live.pop(program, None)
+        else:
+            _live[program] = layout
+    except TypeError:
+        pass
+
+def invalidates(produce):
+    """For methods that add to a component after produce_component: the
+    session no longer matches the recorded layout."""
+    @functools.wraps(produce)
+    def wrapper(self, program, *args, **kwargs):
+        if not getattr(program, "recorder", False):
+            set_live_layout(program, None)
+        return produce(self, program, *args, **kwargs)
+    return wrapper
+
+def incremental(produce):
+    """Runs ``produce(self, program, ...)`` against a Layout first when the
+    component was built with ``incremental=True``.  If the session still holds
+    a layout of the same structure only the changed properties are sent
+    (through a LumScript if ``batch`` is also set); otherwise the component
+    is rebuilt as usual.  The new layout is kept in ``self.layout``."""
+    @functools.wraps(produce)
+    def wrapper(self, program, *args, **kwargs):
+        if getattr(program, "recorder", False):
+            return produce(self, program, *args, **kwargs)
+        if not getattr(self, "incremental", False):
+            set_live_layout(program, None)
+            return produce(self, program, *args, **kwargs)
+        layout = Layout()
+        produce(self, layout, *args, **kwargs)
+        live = live_layout(program)
+        changes = layout.diff(live) if (live is not None and layout.cleared) else None
+        if changes is None:
+            result = produce(self, program, *args, **kwargs)
+        else:
+            result = None
+            target = LumScript(program) if getattr(self, "batch", False) else program
+            if changes:
+                target.switchtolayout()
+            for name, prop, value in changes:
+                target.setnamed(name, prop, value)
+            if target is not program:
+                target.flush()
+        self.layout = layout
+        set_live_layout(program, layout if layout.cleared else None)
+        return result
+    return wrapper
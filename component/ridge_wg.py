@@ -19,6 +19,8 @@ Example of material_params argument:
 
 from .. import lumapi
 from lumapi import LumApiError
+from .script import batched
+from .layout import incremental, invalidates
 
 class Waveguide:
     def __init__(self, width, height, etch):
@@ -27,9 +29,12 @@ class Waveguide:
         self.etch = etch
 
 class RidgeWaveguide:
-    def __init__(self, wg, material_params):
+    def __init__(self, wg, material_params, batch=False, incremental=False):
         self.wg = wg
         self.material_params = material_params
+        self.batch = batch  # emit produce_component as one LSF script
+        self.incremental = incremental  # only send what changed since the last build
+        self.layout = None
 
     def _create_substrate(self, program):  # run first
         program.addrect()
@@ -190,6 +195,8 @@ class RidgeWaveguide:
         self._set_core_geometry(program, name, x_core)
         self._enable_pedestal(program, name, left, right)
 
+    @incremental
+    @batched
     def produce_component(self, program, wavl, x_core, core_name, 
                             cap_thickness, subs_thickness, left=True, right=True, 
                             cleanup=True):
@@ -202,6 +209,8 @@ class RidgeWaveguide:
             cap_thickness, x_core, left, right)
         self.set_mesh_orders(program, core_name)
 
+    @invalidates
+    @batched
     def add_dopant_regions(self, program, core_name,
                             depth=500e-9, dist_to_core=None):  # generally run after produce_component
         self._create_doped_pedestals(program)
@@ -0,0 +1,92 @@
+"""
+Purpose:    Batched emission of component geometry.  Collects the layout commands
+            (addrect, set, setnamed, select, ...) issued by the component
+            constructors into one Lumerical(R) script (LSF) and sends it to the
+            solver through a single `eval` call instead of one API round-trip
+            per command.
+            Commands that return data (e.g. getnamed) flush the pending script
+            first and are then forwarded to the solver unchanged.
+Copyright:  (c) 2021 David Heydari
+"""
+import functools
+import numbers
+import numpy as np
+
+def lsf_value(value):
+    if isinstance(value, str):
+        if '"' not in value:
+            return '"' + value + '"'
+        if "'" not in value:
+            return "'" + value + "'"
+        raise ValueError("Cannot quote string for LSF: " + value)
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        return "%.17g" % float(value)
+    raise TypeError("Cannot batch value of type " + type(value).__name__)
+
+def lsf_command(func, *args):
+    if not args:
+        return func + ";"
+    return func + "(" + ",".join(lsf_value(a) for a in args) + ");"
+
+class LumScript:
+    recorder = True  # not a live solver session
+
+    def __init__(self, program):
+        self.program = program
+        self.lines = []
+
+    def _record(self, func, *args):
+        self.lines.append(lsf_command(func, *args))
+
+    def addrect(self):
+        self._record("addrect")
+    def set(self, prop, value):
+        self._record("set", prop, value)
+    def setnamed(self, name, prop, value):
+        self._record("setnamed", name, prop, value)
+    def select(self, name):
+        self._record("select", name)
+    def shiftselect(self, name):
+        self._record("shiftselect", name)
+    def selectall(self):
+        self._record("selectall")
+    def addtogroup(self, name):
+        self._record("addtogroup", name)
+    def deleteall(self):
+        self._record("deleteall")
+    def switchtolayout(self):
+        if self.lines and self.lines[-1] == "switchtolayout;":
+            return
+        self._record("switchtolayout")
+
+    @property
+    def script(self):
+        return "\n".join(self.lines)
+
+    def flush(self):
+        if self.lines:
+            self.program.eval(self.script)
+            self.lines = []
+
+    def __getattr__(self, attr):  # anything not recorded goes straight to the solver
+        self.flush()
+        return getattr(self.program, attr)
+
+def batched(produce):
+    """Runs ``produce(self, program, ...)`` against a LumScript when the
+    component was built with ``batch=True`` and flushes it once at the end.
+    Nested calls (e.g. the ridges of a coupled waveguide) append to the
+    caller's script, and recording into a Layout is left alone."""
+    @functools.wraps(produce)
+    def wrapper(self, program, *args, **kwargs):
+        if not getattr(self, "batch", False) or getattr(program, "recorder", False):
+            return produce(self, program, *args, **kwargs)
+        script = LumScript(program)
+        result = produce(self, script, *args, **kwargs)
+        script.flush()
+        return result
+    return wrapper
@@ -19,6 +19,9 @@ width2: total extension width
 width1: central core
 """
 
+from .script import batched
+from .layout import incremental
+
 class Staircase:
     def __init__(self, width, width2, height, etch1, etch2):
         self.width1 = width
@@ -29,9 +32,12 @@ class Staircase:
         self.etch2 = etch2
 
 class StaircaseWaveguide:
-    def __init__(self, wg, material_params):
+    def __init__(self, wg, material_params, batch=False, incremental=False):
         self.wg = wg
         self.material_params = material_params
+        self.batch = batch  # emit produce_component as one LSF script
+        self.incremental = incremental  # only send what changed since the last build
+        self.layout = None
 
     def _create_substrate(self, program):  # run first
         program.addrect()
@@ -218,6 +224,8 @@ class StaircaseWaveguide:
         self._set_core_geometry(program, name, x_core, cap_thickness)
         self._enable_pedestal(program, name, left, right)
 
+    @incremental
+    @batched
     def produce_component(self, program, wavl, x_core, core_name, 
             cap_thickness, subs_thickness, left, right):
         program.deleteall()
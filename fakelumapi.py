@@ -0,0 +1,229 @@
+"""
+Purpose:    Local stand-in for the Lumerical(R) Python API (lumapi).
+            Keeps an in-memory Layout of the objects (names, groups,
+            properties, selection) for the subset of commands used by the
+            pylum components and simulation classes, and counts every API
+            round-trip so that batched and unbatched construction can be
+            compared without a Lumerical install or license.
+            findmodes returns canned modes (Gaussian fields on the FDE
+            region, alternately TE and TM, n_eff falling with mode number and
+            wavelength) so that the result-fetching paths can be exercised.
+            Select it before importing pylum with the environment variable
+                PYLUM_LUMAPI=fake
+Copyright:  (c) 2021 David Heydari
+"""
+import re
+import functools
+from collections import OrderedDict
+
+import numpy as np
+import scipy.constants as consts
+
+from .component.layout import Layout, normalize
+
+class LumApiError(Exception):
+    pass
+
+_TOKEN = re.compile(r'''\s*(?:("[^"]*"|'[^']*')|(true|false)\b|([A-Za-z_]\w*)'''
+                    r'''|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(\S))''')
+
+def parse_lsf(script):
+    """Parses the LSF subset emitted by pylum into a list of
+    (target, command, args) tuples; target is None, "var" or "var.field"
+    for statements like  var.field = getdata("mode1", "neff");"""
+    tokens = []
+    for string, boolean, ident, number, punct in _TOKEN.findall(script):
+        if string:
+            tokens.append(("val", string[1:-1]))
+        elif boolean:
+            tokens.append(("val", boolean == "true"))
+        elif ident:
+            tokens.append(("id", ident))
+        elif number:
+            tokens.append(("val", float(number)))
+        elif punct:
+            tokens.append(("p", punct))
+    commands = []
+    i = 0
+    tokens.append(("p", None))  # end of script
+    while tokens[i][1] is not None:
+        target = None
+        if tokens[i][0] == "id" and tokens[i+1] == ("p", "="):
+            target = tokens[i][1]
+            i += 2
+        elif (tokens[i][0] == "id" and tokens[i+1] == ("p", ".") 
+                and tokens[i+2][0] == "id" and tokens[i+3] == ("p", "=")):
+            target = tokens[i][1] + "." + tokens[i+2][1]
+            i += 4
+        kind, func = tokens[i]
+        if kind != "id":
+            raise LumApiError("LSF syntax error near token " + repr(func))
+        args = []
+        i += 1
+        if tokens[i] == ("p", "("):
+            i += 1
+            while tokens[i] != ("p", ")"):
+                if tokens[i][0] != "val" or tokens[i][1] is None:
+                    raise LumApiError("LSF syntax error in call to " + func)
+                args.append(tokens[i][1])
+                i += 1
+                if tokens[i] == ("p", ","):
+                    i += 1
+            i += 1
+        if tokens[i] != ("p", ";"):
+            raise LumApiError("Missing ';' after " + func)
+        i += 1
+        commands.append((target, func, args))
+    return commands
+
+_LAYOUT_COMMANDS = ("deleteall", "addrect", "addmesh", "addfde", "addfdtd", "addpower",
+    "select", "shiftselect", "selectall", "addtogroup", "set", "setnamed",
+    "getnamed", "getnamednumber")
+
+class _Session:
+    def __init__(self, filename=None, key=None, hide=False, serverArgs={}, **kwargs):
+        self.hide = hide
+        self.calls = 0
+        self.log = []
+        self.model = Layout()
+        self.analysis = OrderedDict()
+        self.variables = {}
+        self.materials = OrderedDict()
+        self.layout_mode = True
+        self.closed = False
+
+    def _command(self, attr):
+        cmd = getattr(type(self), "_cmd_" + attr, None)
+        if cmd is not None:
+            return functools.partial(cmd, self)
+        if attr in _LAYOUT_COMMANDS:
+            return getattr(self.model, attr)
+        return None
+
+    def __getattr__(self, attr):  # every public command is one API round-trip
+        cmd = None if attr.startswith("_") else self._command(attr)
+        if cmd is None:
+            raise AttributeError(attr)
+        def call(*args):
+            if self.closed and attr not in ("close", "exit"):
+                raise LumApiError("Session is closed")
+            self.calls += 1
+            self.log.append(attr)
+            try:
+                return cmd(*args)
+            except KeyError as err:
+                raise LumApiError(err.args[0])
+        return call
+
+    def reset_counts(self):
+        self.calls = 0
+        self.log = []
+
+    def snapshot(self):
+        return self.model.describe()
+
+    # Commands
+    def _cmd_eval(self, script):
+        for target, func, args in parse_lsf(script):
+            cmd = self._command(func)
+            if cmd is None:
+                raise LumApiError("Unknown script command " + func)
+            try:
+                value = cmd(*args)
+            except KeyError as err:
+                raise LumApiError(err.args[0])
+            if target is None:
+                continue
+            name, _, field = target.partition(".")
+            if field:
+                self.variables[name][field] = value
+            else:
+                self.variables[name] = value
+
+    def _cmd_struct(self):
+        return OrderedDict()
+
+    def _cmd_switchtolayout(self):
+        self.layout_mode = True
+
+    def _cmd_setanalysis(self, prop, value):
+        self.analysis[prop] = normalize(value)
+    def _cmd_getanalysis(self, prop):
+        return self.analysis[prop]
+
+    def _cmd_addmaterial(self, kind):
+        name = "New material " + str(len(self.materials) + 1)
+        self.materials[name] = OrderedDict([("type", kind)])
+        return name
+    def _cmd_setmaterial(self, name, prop, value):
+        if name not in self.materials:
+            raise LumApiError("There is no material named " + name)
+        if prop == "name":
+            self.materials = OrderedDict((value if k == name else k, v)
+                for k, v in self.materials.items())
+        else:
+            self.materials[name][prop] = value
+
+    # Canned FDE results
+    def _fde(self, prop, default):
+        found = [obj for obj in self.model.objects if obj.path == "FDE"]
+        return found[0].get(prop) if found and prop in found[0].props else default
+
+    def _cmd_findmodes(self):
+        wavl = self._fde("wavelength", 1.55e-6)
+        n = int(self.analysis.get("number of trial modes", 4))
+        x = np.linspace(self._fde("x min", -1e-6), self._fde("x max", 1e-6), 24)
+        y = np.linspace(self._fde("y min", -1e-6), self._fde("y max", 1e-6), 18)
+        X, Y = np.meshgrid(x - x.mean(), y - y.mean(), indexing="ij")
+        w = np.ptp(x)/6
+        self.material = OrderedDict([("x", x[:, None]), ("y", y[:, None]),
+            ("index_y", np.full((len(x), len(y), 1, 1), 1.444 + 0j))])
+        self.modes = OrderedDict()
+        for k in range(n):
+            te = k % 2 == 0
+            neff = 2.5 - 0.1*k - 0.2e6*(wavl - 1.55e-6) + 0j
+            F = ((X/w)**(k//2)*np.exp(-(X**2 + Y**2)/w**2))[:, :, None, None] + 0j
+            Z = 0*F
+            H = neff*F/np.sqrt(consts.mu_0/consts.epsilon_0)
+            self.modes["mode" + str(k + 1)] = OrderedDict([("f", consts.c/wavl),
+                ("Ex", F if te else Z), ("Ey", Z if te else F), ("Ez", Z),
+                ("Hx", Z if te else -H), ("Hy", H if te else Z), ("Hz", Z),
+                ("neff", np.array([[neff]])), ("ng", np.array([[neff.real + 1.5]])),
+                ("loss", np.array([[0.]])),
+                ("TE polarization fraction", 1. if te else 0.),
+                ("TM polarization fraction", 0. if te else 1.)])
+        return float(n)
+
+    def _cmd_getresult(self, *args):
+        return "\n".join(["FDE::data::material"]
+            + ["FDE::data::" + m for m in getattr(self, "modes", ())])
+
+    def _cmd_getdata(self, result, quantity):
+        if result == "FDE::data::material":
+            data = getattr(self, "material", {})
+        else:
+            data = getattr(self, "modes", {}).get(result.split("::")[-1], {})
+        if quantity not in data:
+            raise LumApiError("There is no result " + quantity + " in " + result)
+        return data[quantity]
+
+    def _cmd_selectmode(self, mode_id):
+        pass
+
+    def _cmd_putv(self, name, value):
+        self.variables[name] = value
+    def _cmd_getv(self, name):
+        return self.variables[name]
+
+    def _cmd_save(self, path):
+        pass
+    def _cmd_close(self, *args):
+        self.closed = True
+    def _cmd_exit(self, *args):
+        self.closed = True
+
+class MODE(_Session):
+    pass
+
+class FDTD(_Session):
+    pass
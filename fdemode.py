@@ -12,13 +12,74 @@ mu0 = consts.mu_0
 eps0 = consts.epsilon_0
 Z0 = 1/np.sqrt(eps0/mu0)
 
+import os
+import json
+import functools
+from collections import OrderedDict
 import lumapi
+from .component.layout import Layout, normalize
+from .component.script import lsf_value
+from .sweeps.journal import SweepJournal, save_npy
+from .sweeps.adaptive import adaptive_samples
+from scipy.interpolate import CubicSpline
+from .tools.overlap import overlap_matrix, area_weights
+from .tools import dispersion, perturbation
 
 class FDEModeSimulation:
-    def __init__(self, component, hideGUI=True):
-        self.mode = lumapi.MODE(hide=hideGUI)
+    def __init__(self, component, hideGUI=True, pool=None, cache=None, bulk=True,
+                field_dtype=None):
+        self.hideGUI = hideGUI
+        self.field_dtype = field_dtype  # e.g. np.complex64 to halve field storage
+        self.bulk = bulk  # fetch results in one eval + getv instead of one getdata each
+        self.pool = pool  # pylum.session.SessionPool handing out warm sessions
+        self.cache = cache  # pylum.cache.ResultCache for solve_mode results
         self.component = component
-        self.mode.switchtolayout()
+        self.setup_args = None
+        self.bend_args = None
+        self._mode = None
+        self._pending = OrderedDict()  # latest setup of each kind, until the solver is needed
+        self._near_n = False  # "use max index" switched off by a tracked solve
+        self._region = {}  # (object, property) -> value the session holds for FDE and mesh
+
+    @property
+    def mode(self):  # the solver session is started on first use
+        if self._mode is None:
+            self._mode = (lumapi.MODE(hide=self.hideGUI) if self.pool is None 
+                else self.pool.acquire())
+            self._mode.switchtolayout()
+            self._region = {}
+        pending, self._pending = self._pending, OrderedDict()
+        for setup in pending.values():
+            setup()
+        return self._mode
+
+    @property
+    def _dtype(self):  # fields dtype of a live solve (the solver returns complex128)
+        return complex if self.field_dtype is None else self.field_dtype
+
+    def _defer(self, kind, setup):  # with a cache, a hit must not need a session
+        if self.cache is None:
+            setup()
+        else:  # a later setup of the same kind supersedes the pending one
+            self._pending.pop(kind, None)
+            self._pending[kind] = setup
+
+    def close(self):
+        self._pending = OrderedDict()
+        self._near_n = False
+        self._region = {}
+        if self._mode is None:
+            return
+        if self.pool is not None:
+            self.pool.release(self._mode)
+        else:
+            self._mode.close()
+        self._mode = None
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
     @property
     def xaxis(self):
         return self.mode.getdata("FDE::data::material", "x")[:,0]
@@ -29,14 +90,26 @@ class FDEModeSimulation:
     def index(self):
         return self.mode.getdata("FDE::data::material", "index_y")[:,:,0,0]
 
-    def _add_fde(self):
-        self.mode.addfde()
+    def _set_region(self, name, prop, value):  # only sends values the session does not hold
+        if self._region.get((name, prop)) != normalize(value):
+            self.mode.setnamed(name, prop, value)
+            self._region[(name, prop)] = normalize(value)
+
+    def _added(self, name):  # a new object holds none of the recorded values
+        self._region = dict((k, v) for k, v in self._region.items() if k[0] != name)
+
+    def _add_fde(self):  # kept across incremental component updates
+        if not self.mode.getnamednumber("FDE"):
+            self.mode.addfde()
+            self._added("FDE")
     def _add_mesh(self, dx_mesh, dy_mesh):
-        self.mode.addmesh()
-        self.mode.set("override x mesh", 1)
-        self.mode.set("dx", dx_mesh)
-        self.mode.set("override y mesh", 1)
-        self.mode.set("dy", dy_mesh)
+        if not self.mode.getnamednumber("mesh"):
+            self.mode.addmesh()
+            self._added("mesh")
+        self._set_region("mesh", "override x mesh", 1)
+        self._set_region("mesh", "dx", dx_mesh)
+        self._set_region("mesh", "override y mesh", 1)
+        self._set_region("mesh", "dy", dy_mesh)
 
     def _close_application(self):
         print("Emergency close!")
@@ -46,38 +119,46 @@ class FDEModeSimulation:
                         boundary_cds, mesh_factor):
         self._add_fde()
         self._add_mesh(dx_mesh, dy_mesh)
-        self.mode.setnamed("FDE", "x", x_fde)
-        self.mode.setnamed("FDE", "y", self.component.wg.height/2.)
+        self._set_region("FDE", "x", x_fde)
+        self._set_region("FDE", "y", self.component.wg.height/2.)
         if 'PML' in boundary_cds:
-            self.mode.setnamed("FDE", "y span", self.component.wg.height + wavl)
-            self.mode.setnamed("FDE", "x span", self.component.wg.width + wavl)
+            self._set_region("FDE", "y span", self.component.wg.height + wavl)
+            self._set_region("FDE", "x span", self.component.wg.width + wavl)
         elif 'Metal' in boundary_cds:
-            self.mode.setnamed("FDE", "y span", 3.5*(self.component.wg.height + wavl))
-            self.mode.setnamed("FDE", "x span", 3.5*(self.component.wg.width + wavl))
-        self.mode.setnamed("FDE", "mesh refinement", "conformal variant 0")  
+            self._set_region("FDE", "y span", 3.5*(self.component.wg.height + wavl))
+            self._set_region("FDE", "x span", 3.5*(self.component.wg.width + wavl))
+        self._set_region("FDE", "mesh refinement", "conformal variant 0")  
             # acceptable for sims involving non-metals.
-        self.mode.setnamed("mesh", "y", self.component.wg.height/2.)
-        self.mode.setnamed("mesh", "y span", mesh_factor*self.component.wg.height)
-        self.mode.setnamed("mesh", "x", x_fde)
-        self.mode.setnamed("mesh", "x span", mesh_factor*self.component.wg.width)
-        self.mode.setnamed("mesh", "enabled", mesh)
+        self._set_region("mesh", "y", self.component.wg.height/2.)
+        self._set_region("mesh", "y span", mesh_factor*self.component.wg.height)
+        self._set_region("mesh", "x", x_fde)
+        self._set_region("mesh", "x span", mesh_factor*self.component.wg.width)
+        self._set_region("mesh", "enabled", mesh)
     
     def _set_temperature(self, T):
-        self.mode.setnamed("FDE", "simulation temperature", T)
+        self._set_region("FDE", "simulation temperature", T)
 
     def _set_boundary_cds(self, symmetry, boundary_cds):
         if symmetry:
-            self.mode.setnamed("FDE", "x min bc", "Anti-Symmetric")
+            self._set_region("FDE", "x min bc", "Anti-Symmetric")
         else:
-            self.mode.setnamed("FDE", "x min bc", boundary_cds[0])
-        self.mode.setnamed("FDE", "x max bc", boundary_cds[1])
-        self.mode.setnamed("FDE", "y min bc", boundary_cds[2])
-        self.mode.setnamed("FDE", "y max bc", boundary_cds[3])
+            self._set_region("FDE", "x min bc", boundary_cds[0])
+        self._set_region("FDE", "x max bc", boundary_cds[1])
+        self._set_region("FDE", "y min bc", boundary_cds[2])
+        self._set_region("FDE", "y max bc", boundary_cds[3])
 
     def setup_sim(self, wavl, x_core=0, core_name="structure", symmetry=False,
                 cap_thickness=0.5e-6, subs_thickness=3e-6, mesh=False,
                 dx_mesh=10e-9, dy_mesh=10e-9, boundary_cds=['PML','PML','PML','PML'], 
                 x_fde=0.0, mesh_factor=1.1, T=20):
+        self.setup_args = dict(wavl=wavl, x_core=x_core, core_name=core_name,
+            symmetry=symmetry, cap_thickness=cap_thickness, subs_thickness=subs_thickness,
+            mesh=mesh, dx_mesh=dx_mesh, dy_mesh=dy_mesh, boundary_cds=list(boundary_cds),
+            x_fde=x_fde, mesh_factor=mesh_factor, T=T)
+        self._defer("setup", functools.partial(self._setup_sim, **self.setup_args))
+
+    def _setup_sim(self, wavl, x_core, core_name, symmetry, cap_thickness, subs_thickness,
+                mesh, dx_mesh, dy_mesh, boundary_cds, x_fde, mesh_factor, T):
         self.mode.switchtolayout()
         self.component.produce_component(self.mode, wavl, x_core,
                 core_name, cap_thickness, subs_thickness)
@@ -85,35 +166,116 @@ class FDEModeSimulation:
         self._set_temperature(T + 273.15)
         self._set_boundary_cds(symmetry, boundary_cds)
 
-    def _find_modes(self, wavl, trial_modes):
+    def layout(self):
+        """The component as set up by the last setup_sim, recorded without a session."""
+        a = self.setup_args
+        layout = Layout()
+        self.component.produce_component(layout, a['wavl'], a['x_core'],
+            a['core_name'], a['cap_thickness'], a['subs_thickness'])
+        return layout
+
+    def spec(self):
+        """What the last setup_sim sent to the solver: the component layout
+        (recorded without a session) and the setup arguments."""
+        return dict(component=self.layout().describe(), setup=self.setup_args)
+
+    def geometry_sensitivity(self, data, params=("width", "height", "etch"), delta=1e-9,
+                eps=None):
+        """dn_eff/dp (per m) of the single-wavelength mode data solved with the
+        current setup, for attributes p of component.wg, without further solves
+        (boundary perturbation of the moved rectangle edges, see
+        pylum.tools.perturbation.boundary_shift).  Returns {p: dn_eff/dp}."""
+        wg = self.component.wg
+        before = self.layout()
+        out = OrderedDict()
+        for p in params:
+            value = getattr(wg, p)
+            setattr(wg, p, value + delta)
+            try:
+                after = self.layout()
+            finally:
+                setattr(wg, p, value)
+            out[p] = perturbation.boundary_shift(data, before, after, eps)/delta
+        return out
+
+    def _find_modes(self, wavl, trial_modes, n_target=None):
         self.mode.switchtolayout()
         self.mode.setnamed("FDE", "wavelength", wavl)
         self.mode.setanalysis("number of trial modes", trial_modes)
+        # n_target: search near this index instead of near the max index.
+        # Search settings made on the session are left alone otherwise,
+        # except that the max index search is restored after tracking
+        if n_target is not None:
+            self.mode.setanalysis("use max index", False)
+            self.mode.setanalysis("n", np.real(n_target))
+            self._near_n = True
+        elif self._near_n:
+            self.mode.setanalysis("use max index", True)
+            self._near_n = False
         return self.mode.findmodes()
 
-    def filtered_modes(self, pol_thres, pol):
-        mode_ids = [s.split("::")[2] for s in self.mode.getresult().split('\n')
+    def _mode_ids(self):
+        return [s.split("::")[2] for s in self.mode.getresult().split('\n')
             if 'mode' in s]
-        return [i for i in mode_ids
-            if self.mode.getdata(i, pol+" polarization fraction") > pol_thres]
+
+    def getdata_many(self, requests):
+        """getdata for a list of (result, quantity) pairs.  With bulk=True the
+        solver collects them into one struct that is transferred by a single
+        getv, so the whole list costs two API round-trips."""
+        requests = list(requests)
+        if not self.bulk:
+            return [self.mode.getdata(r, q) for r, q in requests]
+        script = ["pylum_bulk = struct;"]
+        script += ["pylum_bulk.q" + str(i) + " = getdata(" + lsf_value(r) + ", "
+            + lsf_value(q) + ");" for i, (r, q) in enumerate(requests)]
+        self.mode.eval("\n".join(script))
+        data = self.mode.getv("pylum_bulk")
+        return [data["q" + str(i)] for i in range(len(requests))]
+
+    def filtered_modes(self, pol_thres, pol):
+        mode_ids = self._mode_ids()
+        fractions = self.getdata_many((i, pol+" polarization fraction") for i in mode_ids)
+        return [i for i, frac in zip(mode_ids, fractions) if np.real(frac) > pol_thres]
 
     def _select_mode(self, mode_id):
         self.mode.selectmode(mode_id)
 
+    _mode_quantities = ("f", "Ex", "Ey", "Ez", "Hx", "Hy", "Hz", "neff", "ng", "loss")
+
+    def _mode_results(self, mode_ids, material=False):
+        requests = [(m, q) for m in mode_ids for q in self._mode_quantities]
+        if material:
+            requests += [("FDE::data::material", q) for q in ("x", "y", "index_y")]
+        data = self.getdata_many(requests)
+        n = len(self._mode_quantities)
+        modes = [dict(zip(self._mode_quantities, data[i*n:(i+1)*n]))
+            for i in range(len(mode_ids))]
+        if material:
+            x, y, index = data[-3:]
+            return modes, (x[:,0], y[:,0], index[:,:,0,0])
+        return modes
+
+    def package_modes(self, mode_ids):
+        """FDEModeSimData of each of mode_ids, all fetched in one transfer."""
+        modes, (xaxis, yaxis, index) = self._mode_results(mode_ids, material=True)
+        return [FDEModeSimData(xaxis, yaxis, index, c0 / m["f"], 
+                            [m[s][:,:,0,0] for s in ("Ex","Ey","Ez")],
+                            [m[s][:,:,0,0] for s in ("Hx","Hy","Hz")],
+                            m["ng"][0][0], m["neff"][0][0], np.ravel(m["loss"])[0],  # loss: dB/m
+                            dtype=self.field_dtype)
+                for m in modes]
+
     def package_data(self, mode_id):
-        wavl = c0 / self.mode.getdata(mode_id, "f")
-        E_field = [self.mode.getdata(mode_id, s)[:,:,0,0] 
-            for s in ("Ex","Ey","Ez")]
-        n_eff = self.mode.getdata(mode_id, "neff")[0][0]
-        H_field = [self.mode.getdata(mode_id, s)[:,:,0,0] 
-                for s in ("Hx","Hy","Hz")] 
-        n_grp = self.mode.getdata(mode_id, "ng")[0][0]
-        loss = self.mode.getdata(mode_id, "loss")  # dB/m
-        return FDEModeSimData(self.xaxis, self.yaxis, self.index, wavl, 
-                            E_field, H_field, n_grp, n_eff, loss)
+        return self.package_modes([mode_id])[0]
 
     def bent_waveguide_setup(self, bend_radius, orientation_angle, 
             x_bend=None, y_bend=None, z_bend=None):
+        self.bend_args = dict(bend_radius=bend_radius, orientation_angle=orientation_angle,
+            x_bend=x_bend, y_bend=y_bend, z_bend=z_bend)
+        self._defer("bend", functools.partial(self._bent_waveguide_setup, **self.bend_args))
+
+    def _bent_waveguide_setup(self, bend_radius, orientation_angle, 
+            x_bend, y_bend, z_bend):
         self.mode.setanalysis("bent waveguide", True) 
         self.mode.setanalysis("bend radius", bend_radius)
         self.mode.setanalysis("bend orientation", orientation_angle)
@@ -126,82 +288,351 @@ class FDEModeSimulation:
 
     def solve_mode(self, wavl, bent=False, trial_modes=4, 
                 pol_thres=0.96, pol="TE", mode_ind=0):
+        if self.cache is not None and self.setup_args is not None:
+            key = self.cache.key(dict(self.spec(), bend=self.bend_args, solve=dict(
+                wavl=wavl, bent=bent, trial_modes=trial_modes, pol_thres=pol_thres,
+                pol=pol, mode_ind=mode_ind)))
+            data = self.cache.get(key, self._dtype)
+            if data is not None:
+                return data
         self.mode.setanalysis("bent waveguide", bent)            
         self._find_modes(wavl, trial_modes)
         mode_id = self.filtered_modes(pol_thres, pol)[mode_ind]
         self._select_mode(mode_id)
-        return self.package_data(mode_id)
+        data = self.package_data(mode_id)
+        if self.cache is not None and self.setup_args is not None:
+            self.cache.put(key, data)
+        return data
 
-    def run_sweep(self, wavl_center, wavl_span, N_sweep, trial_modes=4, 
-                pol_thres=0.96, pol="TE", mode_ind=0):
-        # Package simulation data
-        wavls = []
-        E_fields = []
-        H_fields = []
-        n_effs = []
-        n_grps = []
-        # Perform sweep
+    @staticmethod
+    def sweep_wavelengths(wavl_center, wavl_span, N_sweep):
         wavl_start = wavl_center - wavl_span/2
         wavl_stop = wavl_center + wavl_span/2
-        for wavl_i in np.linspace(wavl_start, wavl_stop, N_sweep):
+        return np.linspace(wavl_start, wavl_stop, N_sweep)
+
+    def track_mode(self, wavl, previous, trial_modes=2, min_overlap=0.5, max_trial_modes=16):
+        """Solves at wavl for the mode that continues previous (an
+        FDEModeSimData on the same mesh): searches near its n_eff and picks the
+        candidate with the largest field overlap.  If no candidate reaches
+        min_overlap the number of trial modes is doubled (up to max_trial_modes).
+        Returns the mode and its overlap with previous."""
+        while True:
+            self._find_modes(wavl, trial_modes, n_target=previous.n_effs)
+            mode_ids = self._mode_ids()
+            candidates = self.package_modes(mode_ids)
+            overlaps = overlap_matrix([previous], candidates)[0]
+            best = int(np.argmax(overlaps))
+            if overlaps[best] >= min_overlap or trial_modes >= max_trial_modes:
+                break
+            trial_modes = min(2*trial_modes, max_trial_modes)
+        self._select_mode(mode_ids[best])
+        return candidates[best], overlaps[best]
+
+    def iter_sweep(self, wavl_center, wavl_span, N_sweep, trial_modes=4, 
+                pol_thres=0.96, pol="TE", mode_ind=0, skip=(), track=False,
+                track_trial_modes=2, previous=None):
+        """Yields (i, FDEModeSimData) for each wavelength of the sweep as soon
+        as it is solved.  The axes and index are fetched once and shared.
+        With track=True only the first point is picked by polarization and
+        mode_ind; later points follow it by field overlap (track_mode), 
+        searching near the previous n_eff with track_trial_modes (previous
+        can seed the tracking, e.g. from a resumed sweep)."""
+        axes = None
+        skip = set(skip)
+        for i, wavl_i in enumerate(self.sweep_wavelengths(wavl_center, wavl_span, N_sweep)):
+            if i in skip:
+                continue
+            if track and previous is not None:
+                previous, overlap = self.track_mode(wavl_i, previous, track_trial_modes)
+                previous.wavl = wavl_i
+                yield i, previous
+                continue
             self._find_modes(wavl_i, trial_modes)
             mode_id = self.filtered_modes(pol_thres, pol)[mode_ind]
             self._select_mode(mode_id)
-            E_field = [self.mode.getdata(mode_id, s)[:,:,0,0] 
-                for s in ("Ex","Ey","Ez")]
-            n_eff = [self.mode.getdata(mode_id, "neff")][0]
-            H_field = [self.mode.getdata(mode_id, s)[:,:,0,0] 
-                for s in ("Hx","Hy","Hz")]
-            n_grp = [self.mode.getdata(mode_id, "ng")][0]
-            E_fields.append(E_field)
-            H_fields.append(H_field)
-            n_effs.append(n_eff)
-            n_grps.append(n_grp)
-            wavls.append(wavl_i)
-        return FDEModeSimData(self.xaxis, self.yaxis, self.index, wavls, np.array(E_fields), 
-            np.array(H_fields), np.array(n_grps), np.array(n_effs))
+            if axes is None:
+                modes, axes = self._mode_results([mode_id], material=True)
+            else:
+                modes = self._mode_results([mode_id])
+            m = modes[0]
+            previous = FDEModeSimData(axes[0], axes[1], axes[2], wavl_i,
+                [m[s][:,:,0,0] for s in ("Ex","Ey","Ez")],
+                [m[s][:,:,0,0] for s in ("Hx","Hy","Hz")],
+                m["ng"][0][0], m["neff"][0][0], np.ravel(m["loss"])[0],
+                dtype=self.field_dtype)
+            yield i, previous
+
+    def run_sweep(self, wavl_center, wavl_span, N_sweep, trial_modes=4, 
+                pol_thres=0.96, pol="TE", mode_ind=0, journal=None, out=None,
+                track=False, track_trial_modes=2):
+        # journal: directory where each solved point is saved right away;
+        # rerunning the same sweep with it skips the points already done.
+        # out: directory for a memory-mapped fields.npy instead of an
+        # in-memory (N_sweep, 6, Nx, Ny) array.
+        if journal is not None:
+            journal = SweepJournal(journal, dict(self.spec(), run_sweep=dict(
+                wavl_center=wavl_center, wavl_span=wavl_span, N_sweep=N_sweep,
+                trial_modes=trial_modes, pol_thres=pol_thres, pol=pol, mode_ind=mode_ind,
+                track=track, track_trial_modes=track_trial_modes)))
+        done = [] if journal is None else journal.done
+        todo = [i for i in range(N_sweep) if i not in done]
+        previous = None
+        if track and todo and todo[0] > 0 and todo[0] - 1 in done:
+            previous = journal.load_point(todo[0] - 1, self._dtype)
+        sweep = self.iter_sweep(wavl_center, wavl_span, N_sweep, trial_modes,
+            pol_thres, pol, mode_ind, skip=done, track=track,
+            track_trial_modes=track_trial_modes, previous=previous)
+        if journal is not None:
+            for i, data in sweep:
+                journal.add_data(i, data)
+            return journal.load(range(N_sweep), out=out, dtype=self._dtype)
+        # Package simulation data
+        fields = data = None
+        n_effs = np.zeros(N_sweep, dtype=complex)
+        n_grps = np.zeros(N_sweep, dtype=complex)
+        losses = np.zeros(N_sweep)
+        for i, data in sweep:
+            if fields is None:
+                fields = allocate_fields((N_sweep,) + data.fields.shape, out,
+                    dtype=data.fields.dtype)
+            fields[i] = data.fields
+            n_effs[i] = data.n_effs
+            n_grps[i] = data.n_grps
+            losses[i] = np.real(data.loss)
+        if data is None:
+            raise ValueError("Empty sweep")
+        return FDEModeSimData.from_fields(data.xaxis, data.yaxis, data.index, 
+            list(self.sweep_wavelengths(wavl_center, wavl_span, N_sweep)), 
+            fields, n_grps, n_effs, losses)
+
+    def run_adaptive_sweep(self, wavl_center, wavl_span, tol=1e-4, N_init=5, max_points=100,
+                trial_modes=4, pol_thres=0.96, pol="TE", mode_ind=0, track=True, 
+                track_trial_modes=2):
+        """Dispersion sweep on a non-uniform wavelength grid that is refined
+        only where n_eff(λ) bends sharply (see pylum.sweeps.adaptive).
+        Returns the sweep FDEModeSimData (wavelengths ascending) and a cubic
+        spline interpolant of n_eff(λ)."""
+        def solve(wavl, nearest):
+            if track and nearest is not None:
+                data, overlap = self.track_mode(wavl, nearest, track_trial_modes)
+                data.wavl = wavl
+                return data
+            return self.solve_mode(wavl, trial_modes=trial_modes, pol_thres=pol_thres,
+                pol=pol, mode_ind=mode_ind)
+        wavls, modes, err = adaptive_samples(solve, wavl_center - wavl_span/2, 
+            wavl_center + wavl_span/2, tol, N_init, max_points)
+        data = stack_modes(modes, wavls)
+        return data, CubicSpline(wavls, data.n_effs)
+
+def stack_modes(modes, wavls=None, out=None):
+    """Sweep FDEModeSimData from single-wavelength ones sharing a mesh."""
+    fields = allocate_fields((len(modes),) + modes[0].fields.shape, out,
+        dtype=modes[0].fields.dtype)
+    for i, m in enumerate(modes):
+        fields[i] = m.fields
+    if wavls is None:
+        wavls = [float(np.ravel(m.wavl)[0]) for m in modes]
+    return FDEModeSimData.from_fields(modes[0].xaxis, modes[0].yaxis, modes[0].index,
+        list(wavls), fields, np.array([m.n_grps for m in modes]),
+        np.array([m.n_effs for m in modes]), np.array([np.real(m.loss) for m in modes]))
+
+def _to_json(value):  # scalars and arrays, complex as {"re": ..., "im": ...}
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    a = np.asarray(value)
+    if np.iscomplexobj(a):
+        return {"re": np.real(a).tolist(), "im": np.imag(a).tolist()}
+    return a.tolist()
+
+def _from_json(value):
+    if isinstance(value, dict):
+        return np.asarray(value["re"]) + 1j*np.asarray(value["im"])
+    if isinstance(value, list):
+        return np.asarray(value)
+    return value
+
+def allocate_fields(shape, out=None, name="fields", dtype=complex):
+    """Preallocated field storage; memory-mapped <out>/<name>.npy if out is given."""
+    if out is None:
+        return np.zeros(shape, dtype=dtype)
+    os.makedirs(out, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(out, name + ".npy"), mode="w+",
+        dtype=dtype, shape=shape)
 
 
 class FDEModeSimData:
-    def __init__(self, xaxis, yaxis, index, wavel, E_field, H_field, n_grp, n_eff, loss, A_mode=None):
+    # The fields are one array: (6, Nx, Ny) for a single wavelength or 
+    # (N, 6, Nx, Ny) for a sweep, components Ex, Ey, Ez, Hx, Hy, Hz.  E_field
+    # and H_field are views of it.  Axes and index are shared, not copied.
+    __slots__ = ("xaxis", "yaxis", "index", "wavl", "fields", "n_grps", "n_effs",
+        "loss", "A_mode", "_dxdy")
+
+    def __init__(self, xaxis, yaxis, index, wavel, E_field, H_field, n_grp, n_eff, loss, 
+                A_mode=None, dtype=None, fields=None):
         self.xaxis = xaxis
         self.yaxis = yaxis
         self.wavl = wavel
         self.index = index
-        self.E_field = E_field
-        self.H_field = H_field
+        if fields is None and E_field is not None:
+            E = np.asarray(E_field)
+            H = np.zeros_like(E) if H_field is None else np.asarray(H_field)
+            fields = np.empty(E.shape[:-3] + (6,) + E.shape[-2:],
+                dtype=np.result_type(E, H) if dtype is None else dtype)
+            fields[..., :3, :, :] = E
+            fields[..., 3:, :, :] = H
+        elif fields is not None and dtype is not None:
+            fields = fields.astype(dtype, copy=False)
+        self.fields = fields
         self.n_grps = n_grp
         self.n_effs = n_eff
         self.loss = loss
         self.A_mode = A_mode
+        self._dxdy = None
+
+    @classmethod
+    def from_fields(cls, xaxis, yaxis, index, wavel, fields, n_grp, n_eff, loss, A_mode=None,
+                dtype=None):
+        return cls(xaxis, yaxis, index, wavel, None, None, n_grp, n_eff, loss, A_mode,
+            dtype=dtype, fields=fields)
 
     @property
-    def dxdy(self):
-        xax = np.expand_dims(np.diff(self.xaxis, prepend=0),axis=1)
-        yax = np.expand_dims(np.diff(self.yaxis, prepend=0),axis=1)
-        return xax*np.transpose(yax)
-    
-    @staticmethod
-    def _compute_Aeff(E, H, dA):
-        S = np.real(E[0]*np.conj(H[1]) - E[1]*np.conj(H[0])) / np.max(np.abs(H))
-        return (S*dA).sum()
-    
+    def E_field(self):
+        return None if self.fields is None else self.fields[..., :3, :, :]
+    @E_field.setter
+    def E_field(self, value):
+        self.fields[..., :3, :, :] = value
+
+    @property
+    def H_field(self):
+        return None if self.fields is None else self.fields[..., 3:, :, :]
+    @H_field.setter
+    def H_field(self, value):
+        self.fields[..., 3:, :, :] = value
+
+    def astype(self, dtype):  # e.g. np.complex64 for compact storage
+        return FDEModeSimData.from_fields(self.xaxis, self.yaxis, self.index, self.wavl,
+            self.fields.astype(dtype), self.n_grps, self.n_effs, self.loss, self.A_mode)
+
+    # On-disk format: a directory with scalars.json (wavelengths, n_eff, n_grp,
+    # loss, effective area) and xaxis.npy, yaxis.npy, index.npy, fields.npy.
+    format_version = 1
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ("xaxis", "yaxis", "index"):
+            if getattr(self, name) is not None:
+                save_npy(os.path.join(path, name + ".npy"), np.asarray(getattr(self, name)))
+        if self.fields is not None:  # written aside and renamed: fields may map the old file
+            save_npy(os.path.join(path, "fields.npy"), self.fields)
+        A_eff = self.A_mode
+        if A_eff is None and self.fields is not None and self.xaxis is not None:
+            A_eff = self.compute_Aeff()
+        scalars = dict(version=self.format_version,
+            sweep=isinstance(self.wavl, (list, np.ndarray)), wavl=self.wavl,
+            n_eff=self.n_effs, n_grp=self.n_grps, loss=self.loss, A_eff=A_eff)
+        with open(os.path.join(path, "scalars.json"), "w") as f:
+            json.dump(dict((k, _to_json(v)) for k, v in scalars.items()), f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r", dtype=None):
+        """Scalars are read right away; fields.npy is memory-mapped (read
+        only when accessed) unless mmap_mode is None.  dtype: fields dtype
+        to return (default: as saved); a different one reads them into memory."""
+        with open(os.path.join(path, "scalars.json")) as f:
+            s = dict((k, _from_json(v)) for k, v in json.load(f).items())
+        if s["version"] > cls.format_version:
+            raise ValueError(path + " was saved by a newer version of pylum")
+        def array(name, mmap_mode=None):
+            file = os.path.join(path, name + ".npy")
+            return np.load(file, mmap_mode=mmap_mode) if os.path.exists(file) else None
+        wavl = list(s["wavl"]) if s["sweep"] else s["wavl"]
+        return cls.from_fields(array("xaxis"), array("yaxis"), array("index"), wavl,
+            array("fields", mmap_mode), s["n_grp"], s["n_eff"], s["loss"], s["A_eff"],
+            dtype=dtype)
+
+    @property
+    def dxdy(self):  # area of each mesh point (trapezoidal rule), computed once per mesh
+        # keyed on the axis objects themselves (held here, so never recycled)
+        if (self._dxdy is None or self._dxdy[0] is not self.xaxis
+                or self._dxdy[1] is not self.yaxis):
+            self._dxdy = (self.xaxis, self.yaxis, area_weights(self.xaxis, self.yaxis))
+        return self._dxdy[2]
+
+    def _fields(self):  # E, H as (N, 3, Nx, Ny)
+        F = self.fields if self.fields.ndim == 4 else self.fields[None]
+        return F[:, :3], F[:, 3:]
+
+    def _per_wavelength(self, values):
+        return values if isinstance(self.wavl, (list, np.ndarray)) else values[0]
+
     def compute_Aeff(self):
-        if isinstance(self.wavl, (list, np.ndarray)):
-            return [self._compute_Aeff(E, H, self.dxdy)
-                for E,H in zip(self.E_field, self.H_field)]
-        return self._compute_Aeff(self.E_field, self.H_field, self.dxdy)
+        E, H = self._fields()
+        Hmax = np.abs(H).max(axis=(1, 2, 3))
+        S = np.real(E[:,0]*np.conj(H[:,1]) - E[:,1]*np.conj(H[:,0]))
+        return self._per_wavelength(np.einsum('nxy,xy->n', S, self.dxdy)/Hmax)
+
+    def compute_Aeff_nl(self):
+        """Nonlinear effective area (∫|E|² dA)² / ∫|E|⁴ dA."""
+        E, H = self._fields()
+        I = (np.abs(E)**2).sum(axis=1)
+        dA = self.dxdy
+        return self._per_wavelength(np.einsum('nxy,xy->n', I, dA)**2
+            / np.einsum('nxy,xy->n', I**2, dA))
+
+    def _dispersion_args(self):
+        if not isinstance(self.wavl, (list, np.ndarray)):
+            raise ValueError("Dispersion needs a wavelength sweep")
+        return np.asarray(self.wavl, dtype=float), np.real(np.asarray(self.n_effs))
+
+    def group_index(self, method="spline"):
+        """n_g from the sweep's n_eff(λ) (method "spline" or "fd"); does not
+        need the solver's own n_g."""
+        return dispersion.group_index(*self._dispersion_args(), method=method)
+
+    def beta2(self, method="spline"):  # GVD, s^2/m
+        return dispersion.beta2(*self._dispersion_args(), method=method)
+
+    def beta3(self, method="spline"):  # TOD, s^3/m
+        return dispersion.beta3(*self._dispersion_args(), method=method)
+
+    def walkoff(self, other, method="spline"):
+        """1/v_g - 1/v_g,other (s/m) on this sweep's wavelengths."""
+        return dispersion.walkoff(*self._dispersion_args(), *other._dispersion_args(),
+            method=method)
 
     def clip_fields(self, x, y):
-        mask_x = (x[0] < self.xaxis) & (self.xaxis < x[-1])
-        mask_y = (y[0] < self.yaxis) & (self.yaxis < y[-1])
-        if isinstance(self.wavl,(list,np.ndarray)):
-            E_field = [[Ek[mask_x,:][:,mask_y] for Ek in E] for E in self.E_field]
-            H_field = [[Hk[mask_x,:][:,mask_y] for Hk in H] for H in self.H_field]
-            index = [nk[mask_x,:][:,mask_y] for nk in self.index]
-        else:
-            E_field = [Ek[mask_x,:][:,mask_y] for Ek in self.E_field]
-            H_field = [Hk[mask_x,:][:,mask_y] for Hk in self.H_field]
-            index = self.index[mask_x,:][:,mask_y]
-        return FDEModeSimData(self.xaxis[mask_x], self.yaxis[mask_y],
-            index, self.wavl, E_field, H_field, self.n_grps, self.n_effs, self.loss)
+        """Data strictly inside x[0] < x < x[-1], y[0] < y < y[-1]; the fields,
+        axes and index are views into this object's arrays."""
+        sx = slice(np.searchsorted(self.xaxis, x[0], "right"),
+            np.searchsorted(self.xaxis, x[-1], "left"))
+        sy = slice(np.searchsorted(self.yaxis, y[0], "right"),
+            np.searchsorted(self.yaxis, y[-1], "left"))
+        return self.clip_indices(sx, sy)
+
+    def clip_indices(self, sx, sy):  # sx, sy: slices of the x and y mesh points
+        index = None if self.index is None else np.asarray(self.index)[..., sx, sy]
+        return FDEModeSimData.from_fields(self.xaxis[sx], self.yaxis[sy], index, self.wavl,
+            self.fields[..., sx, sy], self.n_grps, self.n_effs, self.loss)
+
+    def crop_window(self, fraction=0.99):
+        """Slices (sx, sy) of a small window holding at least fraction of the
+        modal power (Re S_z) at every wavelength.  Edges are trimmed greedily,
+        always the one costing the least power, using summed-area tables."""
+        E, H = self._fields()
+        S = np.abs(np.real(E[:,0]*np.conj(H[:,1]) - E[:,1]*np.conj(H[:,0])))*self.dxdy
+        S /= S.sum(axis=(1, 2))[:, None, None]
+        C = np.zeros((len(S), S.shape[1] + 1, S.shape[2] + 1))
+        C[:, 1:, 1:] = S.cumsum(axis=1).cumsum(axis=2)
+        power = lambda i0, i1, j0, j1: (C[:, i1, j1] - C[:, i0, j1] - C[:, i1, j0] + C[:, i0, j0]).min()
+        w = [0, S.shape[1], 0, S.shape[2]]
+        while True:
+            trims = [w[:k] + [w[k] + step] + w[k+1:] for k, step in enumerate((1, -1, 1, -1))]
+            trims = [t for t in trims if t[0] < t[1] and t[2] < t[3]]
+            kept = [power(*t) for t in trims]
+            if not kept or max(kept) < fraction:
+                return slice(w[0], w[1]), slice(w[2], w[3])
+            w = trims[int(np.argmax(kept))]
+
+    def auto_crop(self, fraction=0.99):
+        """Clipped data (views) over crop_window(fraction)."""
+        return self.clip_indices(*self.crop_window(fraction))
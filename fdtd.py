@@ -30,10 +30,25 @@ class MonitorType(IntEnum):
     a3D = 8
 
 class FDTDSimulation:
-    def __init__(self, component, hideGUI=True):
-        self.fdtd = lumapi.FDTD(hide=hideGUI)
+    def __init__(self, component, hideGUI=True, pool=None):
+        self.pool = pool  # pylum.session.SessionPool handing out warm sessions
+        self.fdtd = lumapi.FDTD(hide=hideGUI) if pool is None else pool.acquire()
         self.component = component
         self.fdtd.switchtolayout()
+
+    def close(self):
+        if self.fdtd is None:
+            return
+        if self.pool is not None:
+            self.pool.release(self.fdtd)
+        else:
+            self.fdtd.close()
+        self.fdtd = None
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
     @property
     def xaxis(self):
         return self.fdtd.getdata("FDTD::data::material", "x")[:,0]
@@ -0,0 +1,254 @@
+"""
+Purpose:    Local full-vector finite-difference eigenmode solver for quick
+            design screening without a Lumerical(R) session or license.
+            The component is recorded as a Layout (the same layout commands
+            a solver receives) and rasterized onto a non-uniform mesh that
+            has mesh lines on every rectangle edge, with sub-cell averaging
+            of ε (harmonic across an interface, arithmetic along it).
+            The transverse fields on a Yee grid satisfy
+                n² e = P Q e,   e = (Ex, Ey)
+            which is solved with shift-invert ARPACK around a target n_eff.
+            Results come back as FDEModeSimData, like FDEModeSimulation.
+            Conventions as in the solver: exp(-iωt), lossy ε and n_eff
+            with positive imaginary part, loss in dB/m, T in Celsius.
+            The field is zero outside the simulation window (metal
+            boundaries; there is no PML).
+            Without a Lumerical install pylum still imports (lumapi is
+            replaced by a stand-in that only fails when a session is
+            opened), so this module works on any machine.
+Usage:
+            sim = LocalModeSimulation(component, materials={
+                dielectrics.silica: 1.444, 'Si': Si.NASA})
+            sim.setup_sim(wavl)
+            data = sim.solve_mode(wavl)
+Materials:  name -> refractive index, ε(wavl, T) (T in K; e.g. the models
+            in material.indexmodels), or a tuple of three of those for
+            (x, y, z).  The dielectrics.make_* helpers can also create their
+            sampled-data materials here, as in a solver session.
+Copyright:  (c) 2021 David Heydari
+"""
+import scipy.constants as consts
+import numpy as np
+pi = np.pi
+c0 = consts.c
+
+from collections import OrderedDict
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from .component.layout import Layout
+from .fdemode import FDEModeSimData
+from .tools.overlap import area_weights
+
+def mesh_axis(lo, hi, edges, d_coarse, fine=None, d_fine=None):
+    """Mesh lines from lo to hi through every edge in between; spacing at
+    most d_fine within the interval fine, d_coarse elsewhere."""
+    breaks = [lo, hi] + [e for e in edges if lo < e < hi]
+    if fine is not None:
+        breaks += [f for f in fine if lo < f < hi]
+    breaks = np.unique(breaks)
+    breaks = breaks[np.concatenate(([True], np.diff(breaks) > 1e-6*d_coarse))]
+    lines = []
+    for a, b in zip(breaks[:-1], breaks[1:]):
+        d = d_coarse
+        if fine is not None and fine[0] <= (a + b)/2 <= fine[1]:
+            d = min(d_fine, d_coarse)
+        lines.append(np.linspace(a, b, max(1, int(np.ceil((b - a)/d - 1e-9))) + 1)[:-1])
+    return np.concatenate(lines + [[breaks[-1]]])
+
+def _cells(axis):
+    """Bounds of the primary cells [x_i, x_i+1] (the last one extended by
+    its neighbour's width) and of the dual cells [x_i-1/2, x_i+1/2]."""
+    d = np.diff(axis)
+    primary = np.concatenate((axis, [axis[-1] + d[-1]]))
+    dual = np.concatenate(([axis[0] - d[0]/2], (axis[1:] + axis[:-1])/2, [axis[-1] + d[-1]/2]))
+    return primary, dual
+
+def _forward(primary):  # (f[i+1] - f[i])/dx, f = 0 beyond the last point
+    n = len(primary) - 1
+    return sp.diags([-1., 1.], [0, 1], (n, n))/np.diff(primary)[:, None]
+
+def _backward(dual):  # (f[i] - f[i-1])/dx, f = 0 before the first point
+    n = len(dual) - 1
+    return sp.diags([1., -1.], [0, -1], (n, n))/np.diff(dual)[:, None]
+
+def _to_nodes(F, axis):  # average of the half-points on both sides of each node
+    F = np.moveaxis(F, axis, 0)
+    return np.moveaxis((F + np.concatenate((np.zeros_like(F[:1]), F[:-1])))/2, 0, axis)
+
+class LocalModeSimulation:
+    def __init__(self, component, materials=None, subsamples=4, points_per_wavl=15):
+        self.component = component
+        self.materials = OrderedDict([(None, 1.), ("etch", 1.)])  # None: background
+        self.materials.update(materials or {})
+        self.subsamples = subsamples  # per cell and axis, for the averaging of ε
+        self.points_per_wavl = points_per_wavl  # coarse mesh: λ/(n_max points_per_wavl)
+        self.setup_args = None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # material database, so that dielectrics.make_* can create materials here
+    def addmaterial(self, kind):
+        name = "New material " + str(len(self.materials))
+        self.materials[name] = None
+        return name
+
+    def setmaterial(self, name, prop, value):
+        if prop == "name":
+            self.materials[value] = self.materials.pop(name)
+        elif prop == "sampled data":  # columns f, ε (or εx, εy, εz)
+            self.materials[name] = np.asarray(value)
+        # fit settings and anisotropy do not apply: sampled data is interpolated
+
+    def _eps(self, name, wavl, T):
+        """(εx, εy, εz) of material name at wavl, T (K)."""
+        if name not in self.materials or self.materials[name] is None:
+            raise KeyError("No model for material " + repr(name) + "; pass it in materials")
+        model = self.materials[name]
+        if isinstance(model, np.ndarray):
+            f, data = model[:, 0].real, model[:, 1:]
+            order = np.argsort(f)
+            eps = [np.interp(c0/wavl, f[order], col[order].real)
+                + 1j*np.interp(c0/wavl, f[order], col[order].imag) for col in data.T]
+            return np.broadcast_to(eps, (3,)) if len(eps) == 1 else np.array(eps)
+        parts = model if isinstance(model, (tuple, list)) else (model,)*3
+        return np.array([m(wavl, T) if callable(m) else m**2 for m in parts], dtype=complex)
+
+    def layout(self):
+        """The component as set up by the last setup_sim, recorded without a session."""
+        a = self.setup_args
+        layout = Layout()
+        self.component.produce_component(layout, a['wavl'], a['x_core'],
+            a['core_name'], a['cap_thickness'], a['subs_thickness'], **a['component_args'])
+        return layout
+
+    def setup_sim(self, wavl, x_core=0, core_name="structure", symmetry=False,
+                cap_thickness=0.5e-6, subs_thickness=3e-6, mesh=False, dx_mesh=10e-9,
+                dy_mesh=10e-9, boundary_cds=['PML','PML','PML','PML'], x_fde=0.0,
+                mesh_factor=1.1, T=20, component_args=None):
+        """Same arguments, in the same order, and simulation window as
+        FDEModeSimulation.setup_sim, except that symmetry (an anti-symmetric
+        x min boundary) is not available: the window is always the full one
+        with metal walls.  component_args: further arguments of
+        produce_component (e.g. left and right of StaircaseWaveguide)."""
+        if symmetry:
+            raise ValueError("LocalModeSimulation does not support symmetry; "
+                "solve the full window with symmetry=False")
+        self.setup_args = dict(wavl=wavl, x_core=x_core, core_name=core_name,
+            symmetry=symmetry, cap_thickness=cap_thickness, subs_thickness=subs_thickness,
+            mesh=mesh, dx_mesh=dx_mesh, dy_mesh=dy_mesh, boundary_cds=list(boundary_cds),
+            x_fde=x_fde, mesh_factor=mesh_factor, T=T, component_args=dict(component_args or {}))
+        wg = self.component.wg
+        span = 3.5 if 'Metal' in boundary_cds and 'PML' not in boundary_cds else 1.
+        x_span, y_span = span*(wg.width + wavl), span*(wg.height + wavl)
+        self._layout = self.layout()
+        rects = self._layout.rectangles()
+        n_max = max(np.sqrt(np.abs(self._eps(m, wavl, T + 273.15))).max() for x, y, m in rects)
+        d = wavl/(n_max*self.points_per_wavl)
+        fine_x = (x_fde - mesh_factor*wg.width/2, x_fde + mesh_factor*wg.width/2) if mesh else None
+        fine_y = (wg.height/2*(1 - mesh_factor), wg.height/2*(1 + mesh_factor)) if mesh else None
+        self.xaxis = mesh_axis(x_fde - x_span/2, x_fde + x_span/2,
+            [e for x, y, m in rects for e in x], d, fine_x, dx_mesh)
+        self.yaxis = mesh_axis(wg.height/2 - y_span/2, wg.height/2 + y_span/2,
+            [e for x, y, m in rects for e in y], d, fine_y, dy_mesh)
+
+    def _average(self, wavl, T, xb, yb, component, normal):
+        """ε component averaged over the cells [xb[i], xb[i+1]] x [yb[j], yb[j+1]]:
+        harmonic mean across the normal axis (None: arithmetic)."""
+        s = (np.arange(self.subsamples) + 0.5)/self.subsamples
+        xs = xb[:-1, None] + np.diff(xb)[:, None]*s  # (Nx, s)
+        ys = yb[:-1, None] + np.diff(yb)[:, None]*s  # (Ny, s)
+        names = self._layout.rasterize(xs[:, None, :, None], ys[None, :, None, :])
+        eps = np.empty(names.shape, dtype=complex)
+        for name in set(names.ravel()):
+            eps[names == name] = self._eps(name, wavl, T)[component]
+        if normal == "x":
+            return (1/(1/eps).mean(axis=2)).mean(axis=-1)
+        if normal == "y":
+            return (1/(1/eps).mean(axis=3)).mean(axis=2)
+        return eps.mean(axis=(2, 3))
+
+    def _eps_maps(self, wavl, T):
+        """εx, εy, εz averaged around the Ex, Ey and Ez points of the Yee cell."""
+        (xp, xd), (yp, yd) = _cells(self.xaxis), _cells(self.yaxis)
+        return np.array([self._average(wavl, T, xp, yd, 0, "x"),
+            self._average(wavl, T, xd, yp, 1, "y"), self._average(wavl, T, xd, yd, 2, None)])
+
+    def find_modes(self, wavl, trial_modes=4, n_target=None):
+        """The trial_modes modes with n_eff nearest n_target (default: the
+        largest index in the window), in order of decreasing n_eff."""
+        T = self.setup_args['T'] + 273.15
+        k0 = 2*pi/wavl
+        xaxis, yaxis = self.xaxis, self.yaxis
+        nx, ny = len(xaxis), len(yaxis)
+        (xp, xd), (yp, yd) = _cells(xaxis), _cells(yaxis)
+        eps = self._eps_maps(wavl, T)
+        # exp(+iωt) below, so lossy ε enters conjugated; conjugated back at the end
+        eps_x, eps_y, eps_z = eps.conj().reshape(3, -1)
+        if not np.iscomplex(eps).any():
+            eps_x, eps_y, eps_z = eps_x.real, eps_y.real, eps_z.real  # real LU: faster
+        Ix, Iy = sp.eye(nx), sp.eye(ny)
+        Ux, Vx = sp.kron(_forward(xp), Iy)/k0, sp.kron(_backward(xd), Iy)/k0
+        Uy, Vy = sp.kron(Ix, _forward(yp))/k0, sp.kron(Ix, _backward(yd))/k0
+        I = sp.eye(nx*ny)
+        iez = sp.diags(1/eps_z)
+        P = sp.bmat([[-Ux @ iez @ Vy, I + Ux @ iez @ Vx],
+                     [-I - Uy @ iez @ Vy, Uy @ iez @ Vx]])
+        Q = sp.bmat([[Vx @ Uy, -sp.diags(eps_y) - Vx @ Ux],
+                     [sp.diags(eps_x) + Vy @ Uy, -Vy @ Ux]])
+        if n_target is None:
+            n_target = np.sqrt(np.abs(eps).max())
+        vals, vecs = spla.eigs((P @ Q).tocsc(), k=trial_modes, sigma=n_target**2,
+            ncv=max(2*trial_modes + 1, 20))
+        # group index from the energy on the Yee grid, with material dispersion
+        dl = 1e-3*wavl
+        eps_g = np.real(eps - (self._eps_maps(wavl + dl, T)
+            - self._eps_maps(wavl - dl, T))/2*wavl/dl).reshape(3, -1)
+        dxp, dxd, dyp, dyd = np.diff(xp), np.diff(xd), np.diff(yp), np.diff(yd)
+        w_x, w_y = np.outer(dxp, dyd).ravel(), np.outer(dxd, dyp).ravel()  # Ex (hy), Ey (hx)
+        w_z, w_hz = np.outer(dxd, dyd).ravel(), np.outer(dxp, dyp).ravel()
+        names = self._layout.rasterize(xaxis[:, None], yaxis[None, :])
+        index = np.empty(names.shape, dtype=complex)
+        for name in set(names.ravel()):
+            index[names == name] = np.sqrt(self._eps(name, wavl, T)[1])
+        modes = []
+        for n2, e in zip(vals, vecs.T):
+            n = np.sqrt(n2)
+            h = Q @ e/n
+            ex, ey, hx, hy = e[:nx*ny], e[nx*ny:], h[:nx*ny], h[nx*ny:]
+            hz = 1j*(Ux @ ey - Uy @ ex)
+            ez = (Vx @ hy - Vy @ hx)/(1j*eps_z)
+            power = np.real((ex*hy.conj()*w_x - ey*hx.conj()*w_y).sum())
+            energy = (eps_g[0]*np.abs(ex)**2*w_x + eps_g[1]*np.abs(ey)**2*w_y
+                + eps_g[2]*np.abs(ez)**2*w_z + np.abs(hx)**2*w_y + np.abs(hy)**2*w_x
+                + np.abs(hz)**2*w_hz).sum()
+            shape = (nx, ny)
+            E = [_to_nodes(ex.reshape(shape), 0), _to_nodes(ey.reshape(shape), 1), ez.reshape(shape)]
+            H = [_to_nodes(hx.reshape(shape), 1), _to_nodes(hy.reshape(shape), 0),
+                _to_nodes(_to_nodes(hz.reshape(shape), 0), 1)]
+            scale = 1/np.abs(E).max()  # h = Z0 H; conjugated back to exp(-iωt)
+            n_eff = np.conj(n)
+            modes.append(FDEModeSimData(xaxis, yaxis, index, wavl, list(np.conj(E)*scale),
+                list(np.conj(H)*scale*np.sqrt(consts.epsilon_0/consts.mu_0)),
+                energy/(2*power), n_eff, 20/np.log(10)*k0*np.imag(n_eff)))
+        return sorted(modes, key=lambda m: -np.real(m.n_effs))
+
+    def solve_mode(self, wavl, trial_modes=4, pol_thres=0.96, pol="TE", mode_ind=0,
+                n_target=None):
+        """FDEModeSimData of the mode_ind-th mode (by decreasing n_eff) whose
+        pol ("TE": Ex, "TM": Ey) fraction exceeds pol_thres."""
+        modes = [m for m in self.find_modes(wavl, trial_modes, n_target)
+            if polarization_fraction(m, pol) > pol_thres]
+        return modes[mode_ind]
+
+def polarization_fraction(data, pol="TE"):
+    """Share of the transverse |E|² in Ex ("TE") or Ey ("TM")."""
+    dA = area_weights(data.xaxis, data.yaxis)
+    Ex, Ey = [(np.abs(F)**2*dA).sum() for F in np.asarray(data.E_field)[:2]]
+    return (Ex if pol == "TE" else Ey)/(Ex + Ey)
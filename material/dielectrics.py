@@ -15,9 +15,50 @@ eps0 = sc.epsilon_0
 Z0 = 1/np.sqrt(eps0/mu0)
 
 import numpy as np
+import weakref
+from collections import OrderedDict
 import lumapi
 # TODO: include RII db
 
+# Sampled-data materials created in each live solver session:
+# session -> {(model, T, fit_coefs): name}.  Repeat requests return the
+# existing name instead of uploading and fitting the data again.  The
+# material database survives deleteall, so this holds for pooled sessions.
+_registry = weakref.WeakKeyDictionary()
+
+def registered(solver):
+    try:
+        return _registry.setdefault(solver, {})
+    except TypeError:  # cannot be tracked: always create
+        return {}
+
+def _variant_name(base, T, fit_coefs, taken):
+    name = base
+    if T != 295:
+        name += '; T=' + str(round(T-273.15)) + 'C'
+    if fit_coefs != 10:
+        name += '; ' + str(fit_coefs) + ' coefficients'
+    if name in taken:  # another temperature rounding to the same degree
+        name += ' (' + repr(T) + 'K)'
+    return name
+
+def _preload(solver, base, Ts, fit_coefs, sample, anisotropic=False):
+    """Names of the variants of base at temperatures Ts; the missing ones
+    are created from sample(missing Ts), which evaluates them all at once."""
+    known = registered(solver)
+    keys = [(base, float(T), fit_coefs) for T in np.atleast_1d(Ts)]
+    missing = [k for k in OrderedDict.fromkeys(keys) if k not in known]
+    if missing:
+        for key, data in zip(missing, sample(np.array([k[1] for k in missing]))):
+            name = _variant_name(base, key[1], fit_coefs, set(known.values()))
+            solver.setmaterial(solver.addmaterial("Sampled data"), "name", name)
+            if anisotropic:
+                solver.setmaterial(name, "Anisotropy", 1)
+            solver.setmaterial(name, "max coefficients", fit_coefs) 
+            solver.setmaterial(name, "sampled data", data)
+            known[key] = name
+    return [known[k] for k in keys]
+
 # Common Lumerical materials (listed)
 air = 'etch'
 silicon = 'Si (Silicon) - Palik'
@@ -28,30 +69,28 @@ silica = 'SiO2 (Glass) - Palik'
 def make_Si_nasa(solver, T=295, fit_coefs=10):  # solver: usually the default solver 
     # edit (C:\Users\heydarid\OneDrive - Stanford\research\templates\LUMERICAL), 
     # then copy to (C:\Program Files\Lumerical\v211\defaults).
+    return preload_Si_nasa(solver, [T], fit_coefs)[0]
+
+def preload_Si_nasa(solver, Ts, fit_coefs=10):  # several temperatures (K) in one go
     from .indexmodels import Si
-    name = 'Si (Silicon) - NASA'
-    if T != 295:
-        name = 'Si (Silicon) - NASA; T=' + str(round(T-273.15)) + 'C'
     wavls = np.linspace(1, 4, 1000)*1e-6
-    eps = Si.NASA(wavls, T)
-    solver.setmaterial(solver.addmaterial("Sampled data"), "name", name)
-    solver.setmaterial(name, "max coefficients", fit_coefs) 
-    solver.setmaterial(name, "sampled data", np.array([c0 / wavls, eps]).T)
-    return name
+    def sample(Ts):
+        eps = Si.NASA(wavls[None,:], Ts[:,None])
+        return [np.array([c0 / wavls, eps_T]).T for eps_T in eps]
+    return _preload(solver, 'Si (Silicon) - NASA', Ts, fit_coefs, sample)
 silicon_nasa = 'Si (Silicon) - NASA'
 
 # Anisotropic materials
 #### MgO:LiNbO3 ####
 def make_LN_gayer(solver, T=295, fit_coefs=10):
+    return preload_LN_gayer(solver, [T], fit_coefs)[0]
+
+def preload_LN_gayer(solver, Ts, fit_coefs=10):
     from .indexmodels import MgOLN
-    name = 'MgO:LN - Gayer'
     wavls = np.linspace(0.5, 4, 1000)*1e-6
-    eps_o = MgOLN.gayer2008_o(wavls, T)
-    eps_e = MgOLN.gayer2008_e(wavls, T)
-    solver.setmaterial(solver.addmaterial("Sampled data"), "name", name)
-    solver.setmaterial(name, "Anisotropy", 1)
-    solver.setmaterial(name, "max coefficients", fit_coefs) 
-    solver.setmaterial(name, "sampled data", 
-        np.array([c0 / wavls, eps_o, eps_o, eps_e]).T)
-    return name
+    def sample(Ts):
+        eps_o = MgOLN.gayer2008_o(wavls[None,:], Ts[:,None])
+        eps_e = MgOLN.gayer2008_e(wavls[None,:], Ts[:,None])
+        return [np.array([c0 / wavls, o, o, e]).T for o, e in zip(eps_o, eps_e)]
+    return _preload(solver, 'MgO:LN - Gayer', Ts, fit_coefs, sample, anisotropic=True)
 gayer_LN = 'MgO:LN - Gayer'
\ No newline at end of file
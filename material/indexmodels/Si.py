@@ -10,11 +10,12 @@ import numpy as np
 """
     From NASA paper "Temperature-dependent refractive index of
     silicon and germanium" (Frey, 2006)
+    wavl and T broadcast against each other.
 """
 
 def NASA(wavl, T):  # T in Kelvin
-    wavl_um = wavl*1e6
-    T_pow = np.arange(0,5)
+    wavl_um = np.asarray(wavl)*1e6
+    T = np.asarray(T, dtype=np.float64)
     S1 = [10.4907, -2.0802e-4, 4.21694e-6, -5.82298e-9, 3.44688e-12]
     S2 = [-1346.61, 29.1664, -0.278724, 1.05939e-3, -1.35089e-6]
     S3 = [4.42827e7, -1.76213e6, -7.61575e4, 678.414, 103.243]
@@ -25,13 +26,10 @@ def NASA(wavl, T):  # T in Kelvin
     l3 = [1.714e6, -1.4498e5, -6.90744e3, -39.3699, 23.577]
 
     l_ij = np.array([l1, l2, l3], dtype=np.float64)
-    S = np.array([[0, 0, 0]], dtype=np.float64).T
-    l = np.array([[0, 0, 0]], dtype=np.float64).T
-
-    for ind_res in np.arange(0,3):
-        for ind_T in np.arange(0,5):
-            S[ind_res] = S[ind_res] + S_ij[ind_res,ind_T] * T ** T_pow[ind_T]
-            l[ind_res] = l[ind_res] + l_ij[ind_res,ind_T] * T ** T_pow[ind_T]
-    n_2_minus_1 = sum(S * wavl_um**2 / ( np.ones((3,1)) * wavl_um**2 - l**2 * np.ones((1, np.size(wavl_um))) ), 0)
+    # coefficients of each resonance are polynomials in T: shape (3,) + T.shape
+    S = np.polynomial.polynomial.polyval(T, S_ij.T)
+    l = np.polynomial.polynomial.polyval(T, l_ij.T)
+    wavl_2 = wavl_um**2
+    n_2_minus_1 = sum(S[k] * wavl_2 / (wavl_2 - l[k]**2) for k in range(3))
     eps = n_2_minus_1 + 1
     return eps
\ No newline at end of file
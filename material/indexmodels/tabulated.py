@@ -0,0 +1,75 @@
+"""
+Purpose:    Tabulated evaluation of index models ε(λ, T) (Si.NASA, MgOLN.gayer2008_*,
+            or any function of wavelength and temperature that broadcasts).
+            The model is evaluated once on a wavelength x temperature grid
+            and later queries are answered by bicubic spline interpolation.
+            The interpolant is compared with the model half-way between grid
+            points, where its error is largest; the grid is refined along
+            the worse axis until that error is below tol or max_points is
+            reached (a RuntimeWarning is issued if tol was not met).
+            .error is the largest deviation seen at those midpoints: an
+            estimate of the interpolation error, not a bound; elsewhere the
+            error can be somewhat larger.
+            The table pays off for models that are expensive to evaluate and
+            for queries on a wavelength x temperature grid or along sorted
+            wavelengths at one temperature. Scattered points go through
+            RectBivariateSpline.ev at roughly 0.4 us per point, which is
+            slower than cheap closed-form models such as the Sellmeier fits
+            in MgOLN; call those directly for large scattered queries.
+Copyright:  (c) Jan 2021 David Heydari
+"""
+
+import functools
+import warnings
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+
+def _midpoints(x):
+    return (x[1:] + x[:-1])/2
+
+class Tabulated:
+    def __init__(self, model, wavl_range, T_range, tol=1e-6, n_wavl=65, n_T=9,
+                max_points=2**20):
+        self.model = model
+        self.wavl_range = tuple(wavl_range)
+        self.T_range = tuple(T_range)
+        while True:
+            wavl = np.linspace(*self.wavl_range, n_wavl)
+            T = np.linspace(*self.T_range, n_T)
+            spline = RectBivariateSpline(wavl, T, model(wavl[:, None], T[None, :]))
+            wm, Tm = _midpoints(wavl), _midpoints(T)
+            err_wavl = np.abs(spline(wm, T) - model(wm[:, None], T[None, :])).max()
+            err_T = np.abs(spline(wavl, Tm) - model(wavl[:, None], Tm[None, :])).max()
+            error = max(err_wavl, err_T)
+            if error <= tol or n_wavl*n_T >= max_points:
+                break
+            if err_wavl >= err_T:
+                n_wavl = 2*n_wavl - 1
+            else:
+                n_T = 2*n_T - 1
+        if error > tol:
+            warnings.warn("Tabulated reached max_points=%d with an estimated error of %.3g "
+                    "(tol %.3g); narrow the wavelength or temperature range or raise "
+                    "max_points" % (max_points, error, tol), RuntimeWarning)
+        self.wavl, self.T = wavl, T
+        self.spline = spline
+        self.error = error  # max |interpolated - model| at the grid midpoints, an estimate
+
+    def __call__(self, wavl, T):  # broadcasts like the model
+        wavl, T = np.asarray(wavl, dtype=float), np.asarray(T, dtype=float)
+        if (wavl.min() < self.wavl[0] or wavl.max() > self.wavl[-1]
+                or T.min() < self.T[0] or T.max() > self.T[-1]):
+            raise ValueError("Outside of the tabulated wavelength and temperature range")
+        shape = np.broadcast_shapes(wavl.shape, T.shape)
+        if (wavl.ndim == T.ndim == 2 and wavl.shape[1] == 1 and T.shape[0] == 1
+                and np.all(np.diff(wavl[:, 0]) > 0) and np.all(np.diff(T[0]) > 0)):
+            return self.spline(wavl[:, 0], T[0])  # wavelength x temperature grid
+        if T.size == 1 and wavl.ndim == 1 and np.all(np.diff(wavl) > 0):
+            return self.spline(wavl, T.ravel())[:, 0].reshape(shape)
+        wavl, T = np.broadcast_arrays(wavl, T)
+        return self.spline.ev(wavl, T)
+
+@functools.lru_cache(maxsize=None)
+def tabulate(model, wavl_range, T_range, tol=1e-6):
+    """Shared Tabulated for the same model, ranges (tuples) and tolerance."""
+    return Tabulated(model, wavl_range, T_range, tol)
@@ -0,0 +1,139 @@
+"""
+Purpose:    Pool of warm Lumerical(R) solver sessions (lumapi.MODE, lumapi.FDTD).
+            Starting a session costs seconds plus a license checkout, so
+            sessions are handed out, reset (switchtolayout + deleteall, and
+            for MODE the FDE search and bend settings pylum changes) when
+            they are given back and reused by the next simulation object.
+            Other analysis settings made on a session carry over to the
+            next user, who must set them if they matter.
+            The number of live sessions is capped at the license count.
+Usage:
+            with SessionPool(lumapi.MODE, max_sessions=2) as pool:
+                sim = FDEModeSimulation(component, pool=pool)
+                ...
+                sim.close()  # session goes back to the pool
+Copyright:  (c) 2021 David Heydari
+"""
+import threading
+from contextlib import contextmanager
+
+import lumapi
+from .component.layout import set_live_layout
+
+class SessionPool:
+    # FDE analysis settings restored on release (FDEModeSimulation sets the
+    # number of trial modes and n before every solve)
+    analysis_defaults = (("use max index", True), ("bent waveguide", False))
+
+    def __init__(self, factory=None, max_sessions=1, hide=True, **session_args):
+        self.factory = lumapi.MODE if factory is None else factory
+        self.max_sessions = max_sessions
+        self.session_args = dict(session_args, hide=hide)
+        self._idle = []
+        self._count = 0  # live sessions, idle or handed out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _start(self):
+        try:
+            return self.factory(**self.session_args)
+        except Exception:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+
+    def start(self, n=1):
+        """Launches sessions ahead of time until n (at most max_sessions)
+        are live, counting those handed out; never waits for them."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SessionPool is closed")
+            k = max(0, min(n, self.max_sessions) - self._count)
+            self._count += k
+        for i in range(k):
+            try:
+                s = self._start()
+            except Exception:
+                with self._cond:
+                    self._count -= k - i - 1  # reserved but not started
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._idle.append(s)
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SessionPool is closed")
+            if not self._idle and self._count >= self.max_sessions:
+                if not self._cond.wait_for(
+                        lambda: self._idle or self._count < self.max_sessions or self._closed,
+                        timeout):
+                    raise TimeoutError("No solver session became free in time")
+                if self._closed:
+                    raise RuntimeError("SessionPool is closed")
+            if self._idle:
+                return self._idle.pop()
+            self._count += 1
+        return self._start()
+
+    def reset(self, session):
+        session.switchtolayout()
+        session.deleteall()
+        if isinstance(session, lumapi.MODE):
+            for prop, value in self.analysis_defaults:
+                session.setanalysis(prop, value)
+        set_live_layout(session, None)
+
+    def _discard(self, session):
+        try:
+            session.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._count -= 1
+            self._cond.notify()
+
+    def release(self, session):
+        with self._cond:
+            if any(s is session for s in self._idle):
+                raise ValueError("Session was already released to the pool")
+        if self._closed:
+            return self._discard(session)
+        try:
+            self.reset(session)
+        except Exception:  # crashed or lost its license: start fresh next time
+            return self._discard(session)
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        s = self.acquire(timeout)
+        try:
+            yield s
+        finally:
+            self.release(s)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for s in idle:
+            self._discard(s)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,60 @@
+"""
+Purpose:    Adaptive wavelength sampling for dispersion sweeps.
+            Starts from a coarse grid and adds solves only where n_eff(λ)
+            is not yet resolved: every interior sample is predicted by a cubic
+            spline through all the other samples (leave-one-out), and the two
+            intervals next to a sample whose prediction misses by more than
+            tol are bisected.  This repeats until all predictions are within
+            tol or max_points is reached.
+            The interior points of the starting grid are shifted by a tenth
+            of a step off the uniform positions.  On a grid symmetric about
+            the middle of the range, a feature centred there (e.g. a tanh
+            step) can be fitted exactly by every leave-one-out spline, and
+            it would never be refined.
+            The leave-one-out error is taken on a grid twice as coarse, so it
+            overestimates the error of the final interpolant (about 16x where
+            n_eff is smooth).
+Copyright:  (c) 2021 David Heydari
+"""
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+def loo_errors(x, y):
+    """Leave-one-out cubic-spline prediction error at each sample
+    (0 at the two ends, which cannot be predicted by interpolation)."""
+    x, y = np.asarray(x), np.asarray(y)
+    err = np.zeros(len(x))
+    if len(x) < 5:
+        return err + np.inf
+    for k in range(1, len(x) - 1):
+        keep = np.arange(len(x)) != k
+        err[k] = np.abs(CubicSpline(x[keep], y[keep])(x[k]) - y[k])
+    return err
+
+def adaptive_samples(solve, wavl_start, wavl_stop, tol, N_init=5, max_points=100,
+                    value=lambda data: data.n_effs):
+    """solve(wavl, nearest) returns the FDEModeSimData at wavl; nearest is the
+    already solved sample closest in wavelength (None for the first one).
+    Returns the sorted wavelengths, their solutions and the final
+    leave-one-out errors."""
+    samples = {}
+    def add(wavls):
+        for w in wavls:
+            known = list(samples)
+            nearest = None if not known else samples[min(known, key=lambda k: abs(k - w))]
+            samples[w] = solve(w, nearest)
+    start = np.linspace(wavl_start, wavl_stop, max(N_init, 5))
+    start[1:-1] += 0.1*(start[1] - start[0])  # not symmetric about the middle
+    add(start)
+    while True:
+        x = np.array(sorted(samples))
+        err = loo_errors(x, [value(samples[w]) for w in x])
+        flagged = set()
+        for k in np.nonzero(err > tol)[0]:
+            flagged.update(i for i in (k - 1, k) if 0 <= i < len(x) - 1)
+        new = [(x[i] + x[i+1])/2 for i in sorted(flagged)]
+        new = new[:max(0, max_points - len(x))]
+        if not new:
+            return x, [samples[w] for w in x], err
+        add(new)
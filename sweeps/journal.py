@@ -0,0 +1,130 @@
+"""
+Purpose:    On-disk journal of completed sweep points, so that a crashed or
+            interrupted sweep can be resumed.  Every solved point is written
+            to its own file as soon as it finishes (atomically: written to a
+            temporary file first, then renamed).  Reopening the journal with
+            the same sweep spec reports the completed points so they can be
+            skipped; a different spec is refused.
+Layout:     <path>/spec.json        canonical sweep spec and its hash
+            <path>/axes.npz         xaxis, yaxis, index (shared by all points)
+            <path>/point_<i>.npz    wavl, E_field, H_field, n_eff, n_grp, loss
+                                    (+ xaxis, yaxis, index when the geometry
+                                    changes between points)
+Copyright:  (c) 2021 David Heydari
+"""
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+def canonical(spec):
+    return json.dumps(spec, sort_keys=True, default=repr)
+
+def spec_hash(spec):
+    return hashlib.sha1(canonical(spec).encode()).hexdigest()
+
+def save_npz(path, **arrays):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+def save_npy(path, array):  # also safe when path is memory-mapped by array itself
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+class SweepJournal:
+    def __init__(self, path, spec):
+        self.path = path
+        self.spec = spec
+        self.hash = spec_hash(spec)
+        os.makedirs(path, exist_ok=True)
+        spec_file = os.path.join(path, "spec.json")
+        if os.path.exists(spec_file):
+            with open(spec_file) as f:
+                stored = json.load(f)
+            if stored["hash"] != self.hash:
+                raise ValueError("Journal " + path + " belongs to a different sweep")
+        else:
+            with open(spec_file, "w") as f:
+                json.dump({"hash": self.hash, "spec": json.loads(canonical(spec))}, f, indent=1)
+
+    def _point_file(self, ind):
+        return os.path.join(self.path, "point_" + str(ind) + ".npz")
+
+    @property
+    def done(self):
+        return sorted(int(s[6:-4]) for s in os.listdir(self.path)
+            if s.startswith("point_") and s.endswith(".npz"))
+
+    def __contains__(self, ind):
+        return os.path.exists(self._point_file(ind))
+
+    @property
+    def has_axes(self):
+        return os.path.exists(os.path.join(self.path, "axes.npz"))
+
+    def set_axes(self, xaxis, yaxis, index):
+        if not self.has_axes:
+            save_npz(os.path.join(self.path, "axes.npz"),
+                xaxis=xaxis, yaxis=yaxis, index=index)
+
+    def axes(self):
+        with np.load(os.path.join(self.path, "axes.npz")) as f:
+            return f["xaxis"], f["yaxis"], f["index"]
+
+    def add(self, ind, wavl, E_field, H_field, n_eff, n_grp, loss, **axes):
+        save_npz(self._point_file(ind), wavl=wavl, E_field=np.asarray(E_field),
+            H_field=np.asarray(H_field), n_eff=n_eff, n_grp=n_grp, loss=loss, **axes)
+
+    def add_data(self, ind, data, shared_axes=True):  # single-point FDEModeSimData
+        axes = dict(xaxis=data.xaxis, yaxis=data.yaxis, index=data.index)
+        if shared_axes:
+            self.set_axes(**axes)
+            axes = {}
+        self.add(ind, data.wavl, data.E_field, data.H_field,
+            data.n_effs, data.n_grps, data.loss, **axes)
+
+    def point(self, ind):
+        with np.load(self._point_file(ind)) as f:
+            return dict((k, f[k]) for k in f.files)
+
+    def load_point(self, ind, dtype=None):  # dtype: of the fields (default: as saved)
+        from ..fdemode import FDEModeSimData
+        p = self.point(ind)
+        if "xaxis" in p:
+            xaxis, yaxis, index = p["xaxis"], p["yaxis"], p["index"]
+        else:
+            xaxis, yaxis, index = self.axes()
+        return FDEModeSimData(xaxis, yaxis, index, p["wavl"].item(), list(p["E_field"]),
+            list(p["H_field"]), p["n_grp"].item(), p["n_eff"].item(), p["loss"].item(),
+            dtype=dtype)
+
+    def load(self, indices=None, out=None, dtype=None):
+        """Completed points (or the given ones) as one sweep FDEModeSimData;
+        needs the axes to be shared by all points.  Fields are filled into one
+        preallocated array (memory-mapped fields.npy in directory out if given)
+        of dtype (default: as saved)."""
+        from ..fdemode import FDEModeSimData, allocate_fields
+        indices = list(self.done if indices is None else indices)
+        xaxis, yaxis, index = self.axes()
+        wavls, n_grps, n_effs, losses = [], [], [], []
+        fields = None
+        for k, i in enumerate(indices):
+            p = self.point(i)
+            if fields is None:
+                shape = (len(indices), 6) + p["E_field"].shape[1:]
+                fields = allocate_fields(shape, out,
+                    dtype=p["E_field"].dtype if dtype is None else dtype)
+            fields[k, :3] = p["E_field"]
+            fields[k, 3:] = p["H_field"]
+            wavls.append(float(np.ravel(p["wavl"])[0]))
+            n_grps.append(p["n_grp"])
+            n_effs.append(p["n_eff"])
+            losses.append(p["loss"])
+        return FDEModeSimData.from_fields(xaxis, yaxis, index, wavls, fields,
+            np.array(n_grps), np.array(n_effs), np.array(losses))
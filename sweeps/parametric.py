@@ -0,0 +1,234 @@
+"""
+Purpose:    Parallel parametric sweep of FDE mode solves over waveguide geometry,
+            material parameters, temperature and wavelength.
+            Points are ordered so that consecutive points differ as little as
+            possible, split into contiguous chunks and handed to a pool of
+            worker processes, each holding its own solver session and an
+            incremental copy of the component (only changed properties are
+            sent to the solver between points).  Results stream back as they
+            finish.
+Usage:
+            points = grid(width=np.linspace(0.8e-6, 1.2e-6, 9),
+                          etch=[0.1e-6, 0.2e-6], wavl=[1.55e-6, 2.09e-6])
+            sweep = ParametricSweep(component, points, workers=4)
+            for ind, point, data in sweep.run():
+                ...
+Point keys: 'wavl' (m), 'T' (Celsius, as in FDEModeSimulation.setup_sim),
+            keys of component.material_params ('subs_mat', 'core_mat', ...),
+            anything else is set as an attribute of component.wg
+            ('width', 'height', 'etch', ...).
+Copyright:  (c) 2021 David Heydari
+"""
+import copy
+import itertools
+import multiprocessing
+import queue
+import traceback
+from collections import OrderedDict
+
+import numpy as np
+from .journal import SweepJournal
+
+def grid(**axes):
+    """All combinations of the given axes; the first axis varies slowest.
+    Consecutive points differ in one axis only (serpentine order)."""
+    keys = list(axes)
+    values = [list(v) for v in axes.values()]
+    points = [[]]
+    for vals in values:
+        points = [p + [v] for i, p in enumerate(points)
+            for v in (vals if i % 2 == 0 else vals[::-1])]
+    return [OrderedDict(zip(keys, p)) for p in points]
+
+def _coordinates(points):
+    keys = list(OrderedDict.fromkeys(k for p in points for k in p))
+    cols = []
+    for k in keys:
+        vals = [p.get(k) for p in points]
+        if all(isinstance(v, (int, float, np.number)) for v in vals):
+            col = np.asarray(vals, dtype=float)
+            span = np.ptp(col)
+            cols.append((col - col.min())/span if span > 0 else 0*col)
+        else:  # materials: any change costs as much as a full span
+            levels = dict((v, i) for i, v in enumerate(OrderedDict.fromkeys(map(repr, vals))))
+            cols.append(np.array([levels[repr(v)] for v in vals], dtype=float))
+    return np.array(cols).T if cols else np.zeros((len(points), 0))
+
+def order_points(points):
+    """Greedy nearest-neighbour ordering (L1 distance on normalized values),
+    starting from the first point.  Returns a list of indices into points."""
+    if len(points) < 3:
+        return list(range(len(points)))
+    X = _coordinates(points)
+    left = np.ones(len(points), dtype=bool)
+    order = [0]
+    left[0] = False
+    for i in range(len(points) - 1):
+        d = np.abs(X - X[order[-1]]).sum(axis=1)
+        d[~left] = np.inf
+        order.append(int(np.argmin(d)))
+        left[order[-1]] = False
+    return order
+
+def base_values(component, points):
+    """The values on component of every parameter set by any of points."""
+    base = OrderedDict()
+    for key in OrderedDict.fromkeys(k for p in points for k in p):
+        if key in ('wavl', 'T'):
+            continue
+        if key in component.material_params:
+            base[key] = component.material_params[key]
+        elif hasattr(component.wg, key):
+            base[key] = getattr(component.wg, key)
+        else:
+            raise ValueError("Unknown sweep parameter: " + key)
+    return base
+
+def apply_point(component, point, base=None):
+    """Sets the geometry and material parameters of a point on component;
+    returns (wavl, T) of the point (None if not given).  base (see
+    base_values) is restored first, so that parameters the point omits do
+    not keep the values of the point applied before."""
+    values = OrderedDict(base or ())
+    values.update((k, v) for k, v in point.items() if k not in ('wavl', 'T'))
+    for key, val in values.items():
+        if key in component.material_params:
+            component.material_params[key] = val
+        elif hasattr(component.wg, key):
+            setattr(component.wg, key, val)
+        else:
+            raise ValueError("Unknown sweep parameter: " + key)
+    return point.get('wavl'), point.get('T')
+
+def solve_point(sim, point, wavl=None, setup_args={}, solve_args={}, base=None):
+    wavl_i, T = apply_point(sim.component, point, base)
+    wavl_i = wavl if wavl_i is None else wavl_i
+    args = dict(setup_args)
+    if T is not None:
+        args['T'] = T
+    sim.setup_sim(wavl_i, **args)
+    return sim.solve_mode(wavl_i, **solve_args)
+
+def _work(factory, component, wavl, setup_args, solve_args, base, tasks, results):
+    from ..session import SessionPool
+    from ..fdemode import FDEModeSimulation
+    component = copy.deepcopy(component)
+    component.incremental = True
+    with SessionPool(factory, max_sessions=1) as pool:
+        sim = FDEModeSimulation(component, pool=pool)
+        while True:
+            chunk = tasks.get()
+            if chunk is None:
+                break
+            for ind, point in chunk:
+                try:
+                    results.put((ind, solve_point(sim, point, wavl, setup_args, solve_args,
+                        base)))
+                except Exception:
+                    results.put((ind, RuntimeError(traceback.format_exc())))
+        sim.close()
+
+class ParametricSweep:
+    def __init__(self, component, points, wavl=None, workers=1, factory=None,
+                setup_args=None, solve_args=None, chunks_per_worker=4, journal=None):
+        self.component = component
+        self.points = [OrderedDict(p) for p in points]
+        self.wavl = wavl  # used for points without a 'wavl' key
+        self.workers = workers
+        self.factory = factory  # session factory, lumapi.MODE by default
+        self.setup_args = setup_args or {}
+        self.solve_args = solve_args or {}
+        self.chunks_per_worker = chunks_per_worker
+        for p in self.points:
+            if 'wavl' not in p and wavl is None:
+                raise ValueError("Sweep point without wavelength: " + repr(dict(p)))
+            apply_point(copy.deepcopy(component), p)
+        self.base = base_values(component, self.points)  # restored before each point
+        # journal: directory where each solved point is saved right away;
+        # rerunning the same sweep with it skips the points already done.
+        self.journal = None if journal is None else SweepJournal(journal, self.spec())
+
+    def spec(self):
+        return dict(component=type(self.component).__name__,
+            wg=vars(self.component.wg), material_params=dict(self.component.material_params),
+            points=[dict(p) for p in self.points], wavl=self.wavl,
+            setup_args=self.setup_args, solve_args=self.solve_args)
+
+    def chunks(self, indices=None):
+        order = order_points(self.points)
+        keep = set(range(len(self.points)) if indices is None else indices)
+        if self.journal is not None:
+            keep -= set(self.journal.done)
+        order = [i for i in order if i in keep]
+        n = max(1, min(len(order), self.workers*self.chunks_per_worker))
+        return [[(i, self.points[i]) for i in c] for c in np.array_split(order, n) if len(c)]
+
+    def run(self, indices=None):
+        """Yields (index, point, FDEModeSimData) as points finish.  A failed
+        point yields the exception (with the worker traceback) instead of data.
+        Points already in the journal are skipped."""
+        for ind, point, data in self._run(indices):
+            if self.journal is not None and not isinstance(data, Exception):
+                self.journal.add_data(ind, data, shared_axes=False)
+            yield ind, point, data
+
+    def _run(self, indices):
+        chunks = self.chunks(indices)
+        if not chunks:
+            return
+        if self.workers < 1:  # in-process, e.g. for debugging
+            yield from self._run_serial(chunks)
+            return
+        ctx = multiprocessing.get_context()
+        tasks, results = ctx.Queue(), ctx.Queue()
+        for c in chunks:
+            tasks.put([(int(i), p) for i, p in c])
+        procs = [ctx.Process(target=_work, daemon=True,
+                args=(self.factory, self.component, self.wavl,
+                    self.setup_args, self.solve_args, self.base, tasks, results))
+                for i in range(min(self.workers, len(chunks)))]
+        for p in procs:
+            tasks.put(None)
+            p.start()
+        remaining = sum(len(c) for c in chunks)
+        try:
+            while remaining:
+                try:
+                    ind, data = results.get(timeout=1.)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs):
+                        raise RuntimeError("All sweep workers exited with "
+                            + str(remaining) + " points left")
+                    continue
+                remaining -= 1
+                yield ind, self.points[ind], data
+        finally:
+            for p in procs:
+                p.join(timeout=1.)
+                if p.is_alive():
+                    p.terminate()
+
+    def _run_serial(self, chunks):
+        from ..session import SessionPool
+        from ..fdemode import FDEModeSimulation
+        component = copy.deepcopy(self.component)
+        component.incremental = True
+        with SessionPool(self.factory, max_sessions=1) as pool:
+            with FDEModeSimulation(component, pool=pool) as sim:
+                for ind, point in itertools.chain.from_iterable(chunks):
+                    try:
+                        data = solve_point(sim, point, self.wavl, self.setup_args,
+                            self.solve_args, self.base)
+                    except Exception as err:
+                        data = err
+                    yield int(ind), point, data
+
+    def collect(self, indices=None):
+        """Runs the sweep and returns the results in the order of points."""
+        out = [None]*len(self.points)
+        if self.journal is not None:
+            for ind in self.journal.done:
+                out[ind] = self.journal.load_point(ind)
+        for ind, point, data in self.run(indices):
+            out[ind] = data
+        return out
@@ -0,0 +1,32 @@
+"""
+Tests run against the local stand-in backend (fakelumapi), so no Lumerical
+install is needed.  The package is registered as pylum whatever the name of
+the checkout directory.
+"""
+import os
+import sys
+import importlib.util
+
+import numpy as np
+import pytest
+
+os.environ["PYLUM_LUMAPI"] = "fake"
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if "pylum" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("pylum", os.path.join(root, "__init__.py"),
+        submodule_search_locations=[root])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["pylum"] = module
+    spec.loader.exec_module(module)
+
+@pytest.fixture
+def mode_data():
+    """Single-wavelength FDEModeSimData of a Gaussian TE-like mode."""
+    from pylum.fdemode import FDEModeSimData
+    x, y = np.linspace(-2e-6, 2e-6, 41), np.linspace(-1.5e-6, 1.5e-6, 31)
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    E = np.exp(-(X**2 + (Y/0.7)**2)/1e-12) + 0j
+    z = 0*E
+    n_eff = 2.1 + 1e-5j
+    return FDEModeSimData(x, y, 1.5 + 0*X, 1.55e-6, [E, z, z], [z, n_eff*E/376.73, z],
+        3.9, n_eff, 0.4)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from scipy.interpolate import CubicSpline
+from pylum.sweeps.adaptive import adaptive_samples, loo_errors
+
+def sample(f, tol=1e-4, max_points=300):
+    return adaptive_samples(lambda w, nearest: f(w), 0., 1., tol, max_points=max_points,
+        value=lambda v: v)
+
+def test_loo_errors_vanish_for_cubics():
+    x = np.sort(np.random.default_rng(0).uniform(0, 1, 9))
+    assert np.allclose(loo_errors(x, 1 - 2*x + x**3), 0, atol=1e-12)
+    assert np.all(np.isinf(loo_errors(x[:4], x[:4])))
+
+@pytest.mark.parametrize("centre", [0.3, 0.5])  # 0.5: symmetric about the range
+def test_step_is_resolved(centre):
+    f = lambda w: np.tanh((w - centre)/0.02)
+    x, values, err = sample(f)
+    assert len(x) < 300 and err.max() <= 1e-4
+    assert np.mean(np.abs(x - centre) < 0.1) > 0.5  # clustered at the step
+    t = np.linspace(0, 1, 10001)
+    assert np.abs(CubicSpline(x, values)(t) - f(t)).max() <= 1e-4
+
+def test_smooth_needs_no_refinement():
+    x, values, err = sample(lambda w: 1 - 2*w + w**3)
+    assert len(x) == 5
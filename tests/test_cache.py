@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from pylum.cache import ResultCache
+from pylum.fdemode import FDEModeSimulation
+from pylum.component.ridge_wg import RidgeWaveguide, Waveguide
+from pylum.tools.farfield import farfield
+
+materials = OrderedDict([("subs_mat", "SiO2"), ("core_mat", "Si"), ("cap_mat", "SiO2")])
+
+def test_get_round_trip(tmp_path, mode_data):
+    cache = ResultCache(str(tmp_path))
+    cache.put("key", mode_data)
+    cached = cache.get("key")
+    assert isinstance(cached.wavl, float)
+    assert cached.n_effs == mode_data.n_effs
+    assert np.ndim(cached.compute_Aeff()) == 0
+    assert np.allclose(cached.compute_Aeff(), mode_data.compute_Aeff())
+    for a, b in zip(farfield(cached, 1e-3), farfield(mode_data, 1e-3)):
+        assert a.shape == b.shape and np.allclose(a, b)
+
+def setup_calls(tmp_path, n):
+    wg = Waveguide(0.8e-6, 0.6e-6, 0.3e-6)
+    sim = FDEModeSimulation(RidgeWaveguide(wg, materials), cache=ResultCache(str(tmp_path)))
+    for i in range(n):
+        wg.width = 0.8e-6 + i*1e-8
+        sim.setup_sim(1.55e-6)
+        sim.bent_waveguide_setup(1e-4, 0)
+    calls = sim.mode.calls
+    sim.close()
+    return calls
+
+def test_only_latest_setup_replayed(tmp_path):
+    assert setup_calls(tmp_path, 50) == setup_calls(tmp_path, 1)
+
+@pytest.mark.parametrize("put_dtype, get_dtype", [(None, np.complex64), (np.complex64, None)])
+def test_hit_has_miss_dtype(tmp_path, put_dtype, get_dtype):
+    def solve(field_dtype):
+        sim = FDEModeSimulation(RidgeWaveguide(Waveguide(0.8e-6, 0.6e-6, 0.3e-6), materials),
+            cache=cache, field_dtype=field_dtype)
+        sim.setup_sim(1.55e-6)
+        data = sim.solve_mode(1.55e-6)
+        sim.close()
+        return data
+    cache = ResultCache(str(tmp_path))
+    solve(put_dtype)
+    hit = solve(get_dtype)
+    cache.clear()
+    miss = solve(get_dtype)
+    assert (cache.misses, cache.hits) == (2, 1)
+    assert hit.fields.dtype == miss.fields.dtype
+    assert np.allclose(hit.fields, miss.fields, rtol=1e-6)
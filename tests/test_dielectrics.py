@@ -0,0 +1,35 @@
+import numpy as np
+from pylum import fakelumapi
+from pylum.material import dielectrics
+
+base = dielectrics.silicon_nasa
+
+def test_one_session_reuses_names():
+    session = fakelumapi.MODE()
+    name = dielectrics.make_Si_nasa(session, 300)
+    assert name == base + "; T=27C"
+    assert dielectrics.make_Si_nasa(session, 300) == name
+    assert dielectrics.preload_Si_nasa(session, [300, 300.]) == [name, name]
+    assert list(session.materials) == [name]
+    assert dielectrics._registry[session] == {(base, 300., 10): name}
+    assert dielectrics.make_Si_nasa(session, 300, fit_coefs=6) == name + "; 6 coefficients"
+    assert len(session.materials) == 2
+    other = fakelumapi.MODE()  # a new session has none of them yet
+    assert dielectrics.make_Si_nasa(other, 300) == name
+    assert list(other.materials) == [name]
+
+def test_temperatures_make_distinct_variants():
+    session = fakelumapi.MODE()
+    names = dielectrics.preload_Si_nasa(session, [295, 300, 300.4, 300, 350])
+    assert names == [base, base + "; T=27C", base + "; T=27C (300.4K)", base + "; T=27C",
+        base + "; T=77C"]
+    assert list(session.materials) == list(dict.fromkeys(names))
+    data = [session.materials[n]["sampled data"] for n in names[1:3]]
+    assert data[0].shape == (1000, 2) and not np.array_equal(data[0], data[1])
+    assert dielectrics.make_Si_nasa(session, 300.4) == names[2]
+    assert len(session.materials) == 4
+
+def test_variant_name():
+    assert dielectrics._variant_name("A", 295, 10, set()) == "A"
+    assert dielectrics._variant_name("A", 310, 4, set()) == "A; T=37C; 4 coefficients"
+    assert dielectrics._variant_name("A", 310.2, 10, {"A; T=37C"}) == "A; T=37C (310.2K)"
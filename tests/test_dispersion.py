@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from pylum.tools import dispersion
+from pylum.tools.dispersion import c0, fd_weights
+
+def test_fd_weights_known_stencils():
+    h = 0.1
+    x = np.arange(9)*h
+    assert np.allclose(fd_weights(x, 1)[4, 2:7]*12*h, [1, -8, 0, 8, -1])
+    assert np.allclose(fd_weights(x, 2)[4, 2:7]*12*h**2, [-1, 16, -30, 16, -1])
+    assert np.allclose(fd_weights(x, 1, 3)[4, 3:6]*2*h, [-1, 0, 1])
+    assert np.allclose(fd_weights(x, 2, 3)[4, 3:6]*h**2, [1, -2, 1])
+    assert np.allclose(fd_weights(x, 1, 3)[0, :3]*2*h, [-3, 4, -1])  # one-sided at the ends
+    assert np.allclose(fd_weights(x, 1).sum(axis=1), 0)
+    with pytest.raises(ValueError):
+        fd_weights(x[:2], 2)
+
+# n(λ) = cubic in u = λ/µm - 1.55; derivatives per m
+coeffs = np.array([2.0, -0.3, 0.05, -0.02])
+def n_of(wavl):
+    return np.polyval(coeffs[::-1], wavl*1e6 - 1.55)
+def dn(wavl, m):
+    return np.polyval(np.polyder(coeffs[::-1], m), wavl*1e6 - 1.55)*1e6**m
+
+@pytest.mark.parametrize("method", ["spline", "fd"])
+def test_group_index_and_gvd_of_polynomial(method):
+    wavl = np.random.default_rng(0).uniform(1.45e-6, 1.65e-6, 15)  # unsorted, non-uniform
+    n = n_of(wavl)
+    assert np.allclose(dispersion.group_index(wavl, n, method=method),
+        n - wavl*dn(wavl, 1), rtol=1e-9)
+    assert np.allclose(dispersion.beta2(wavl, n, method=method),
+        wavl**3/(2*np.pi*c0**2)*dn(wavl, 2), rtol=1e-6)
+    assert np.allclose(dispersion.beta3(wavl, n, method=method),
+        -wavl**4/(4*np.pi**2*c0**3)*(3*dn(wavl, 2) + wavl*dn(wavl, 3)), rtol=1e-4)
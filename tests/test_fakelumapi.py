@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+import pytest
+from pylum import fakelumapi
+from pylum.component.ridge_wg import RidgeWaveguide, Waveguide
+from pylum.component.staircase_wg import StaircaseWaveguide, Staircase
+from pylum.component.coupled_wg import CoupledRidgeWaveguide, CoupledWaveguide
+
+materials = OrderedDict([("subs_mat", "SiO2"), ("core_mat", "Si"), ("cap_mat", "SiO2")])
+
+def ridge(batch):
+    return RidgeWaveguide(Waveguide(0.8e-6, 0.6e-6, 0.3e-6), materials, batch=batch), {}
+
+def staircase(batch):
+    wg = Staircase(0.8e-6, 0.4e-6, 0.6e-6, 0.2e-6, 0.1e-6)
+    return StaircaseWaveguide(wg, materials, batch=batch), dict(left=True, right=True)
+
+def coupled(batch):
+    wg = CoupledWaveguide(0.3e-6, 0.2e-6, 0.8e-6, 0.8e-6, 0.6e-6, 0.3e-6, 0.3e-6)
+    return CoupledRidgeWaveguide(wg, materials, batch=batch), {}
+
+def build(make, batch):
+    component, extra = make(batch)
+    session = fakelumapi.MODE()
+    component.produce_component(session, 1.55e-6, 0, "structure", 0.5e-6, 3e-6, **extra)
+    return session.snapshot(), session.calls
+
+@pytest.mark.parametrize("make", [ridge, staircase, coupled])
+def test_batched_matches_unbatched(make):
+    layout, calls = build(make, batch=False)
+    batched_layout, batched_calls = build(make, batch=True)
+    assert batched_layout == layout
+    assert calls > 50
+    assert batched_calls == 1
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from numpy.fft import fft2, fftfreq, fftshift
+from scipy.interpolate import RegularGridInterpolator
+from pylum.fdemode import FDEModeSimData
+from pylum.tools.farfield import direct_transform, farfield, farfield_zoom
+
+def fixed_pad(data, d, pad_number=3000):  # farfield before resolution-based sizing
+    λ0 = data.wavl
+    E = np.pad(np.asarray(data.E_field)[0], pad_number, mode="constant")
+    dx, dy = np.diff(data.xaxis).min(), np.diff(data.yaxis).min()
+    X, Y = np.meshgrid(fftfreq(E.shape[0], dx)*λ0*d, fftfreq(E.shape[1], dy)*λ0*d)
+    return (fftshift(X), fftshift(Y), dx*dy/(λ0*d)*np.abs(fftshift(fft2(E.T))))
+
+def gaussian_mode(x, y):
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    E = np.exp(-((X - 0.1e-6)**2 + (Y/0.7)**2)/0.25e-12) + 0j
+    z = 0*E
+    return FDEModeSimData(x, y, 1.5 + 0*X, 1.55e-6, [E, z, z], [z, 2.1*E/376.73, z],
+        3.9, 2.1, 0.)
+
+@pytest.fixture
+def uniform_mode():
+    return gaussian_mode(np.linspace(-2e-6, 2e-6, 41), np.linspace(-1.5e-6, 1.5e-6, 31))
+
+def test_same_padding_matches_fixed_pad(uniform_mode):
+    # 41 + 2*592 and 31 + 2*592 are fast FFT lengths, so the grids coincide
+    X0, Y0, A0 = fixed_pad(uniform_mode, 1e-3, 592)
+    X, Y, A = farfield(uniform_mode, 1e-3, pad_number=592)
+    i = np.searchsorted(X0[0], X[0, 0]), np.searchsorted(Y0[:, 0], Y[0, 0])
+    window = A0[i[1]:i[1] + A.shape[0], i[0]:i[0] + A.shape[1]]
+    assert np.allclose(X, X0[i[1]:i[1] + A.shape[0], i[0]:i[0] + A.shape[1]])
+    assert np.allclose(A, window, rtol=1e-9, atol=1e-12*A0.max())
+
+def test_resolution_sizing_matches_fixed_pad(uniform_mode):
+    X0, Y0, A0 = fixed_pad(uniform_mode, 1e-3, 1000)
+    X, Y, A = farfield(uniform_mode, 1e-3)
+    reference = RegularGridInterpolator((Y0[:, 0], X0[0]), A0)((Y, X))
+    assert np.abs(A - reference).max() < 1e-3*A0.max()
+
+@pytest.mark.parametrize("na", [1., 1.444])
+def test_crop_keeps_exactly_propagating_directions(uniform_mode, na):
+    d, λ0 = 1e-3, uniform_mode.wavl
+    X, Y, A = farfield(uniform_mode, d, pad_number=592, na=na)
+    for s, n, step in ((X[0]/d, 41 + 2*592, 1e-7), (Y[:, 0]/d, 31 + 2*592, 1e-7)):
+        all_sin = fftshift(fftfreq(n, step))*λ0
+        assert np.all(np.abs(s) <= na*(1 + 1e-12))
+        assert np.allclose(s, all_sin[np.abs(all_sin) <= na])
+
+def test_zoom_matches_direct_transform(uniform_mode):
+    d, λ0 = 1e-3, uniform_mode.wavl
+    theta = np.radians([-5., 5.])
+    X, Y, A = farfield_zoom(uniform_mode, d, theta, theta, n=(51, 41))
+    f = np.sin(theta)/λ0
+    direct = np.abs(direct_transform(np.asarray(uniform_mode.E_field)[0], uniform_mode.xaxis,
+        uniform_mode.yaxis, np.linspace(*f, 51), np.linspace(*f, 41))).T/(λ0*d)
+    assert np.abs(A - direct).max() < 1e-6*direct.max()
+
+def test_non_uniform_mesh_matches_uniform(uniform_mode):
+    x = np.unique(np.concatenate((np.linspace(-2e-6, -1e-6, 6), np.linspace(-1e-6, 1e-6, 21),
+        np.linspace(1e-6, 2e-6, 6))))
+    y = np.unique(np.concatenate((np.linspace(-1.5e-6, -0.7e-6, 5),
+        np.linspace(-0.7e-6, 0.7e-6, 15), np.linspace(0.7e-6, 1.5e-6, 5))))
+    X0, Y0, A0 = farfield(uniform_mode, 1e-3)
+    X, Y, A = farfield(gaussian_mode(x, y), 1e-3)
+    assert np.allclose(X, X0) and np.allclose(Y, Y0)
+    assert np.abs(A - A0).max() < 5e-3*A0.max()
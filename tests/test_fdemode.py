@@ -0,0 +1,178 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from pylum.fdemode import FDEModeSimulation
+from pylum.component.ridge_wg import RidgeWaveguide, Waveguide
+from pylum.sweeps.parametric import ParametricSweep, apply_point, base_values, grid
+
+materials = OrderedDict([("subs_mat", "SiO2"), ("core_mat", "Si"), ("cap_mat", "SiO2")])
+
+def component():
+    return RidgeWaveguide(Waveguide(0.8e-6, 0.6e-6, 0.3e-6), materials)
+
+def solve(bulk, pol):
+    sim = FDEModeSimulation(component(), bulk=bulk)
+    sim.setup_sim(1.55e-6)
+    sim.mode.reset_counts()
+    data = sim.solve_mode(1.55e-6, pol=pol)
+    calls = sim.mode.calls
+    sim.close()
+    return data, calls
+
+@pytest.mark.parametrize("pol", ["TE", "TM"])
+def test_bulk_matches_per_quantity(pol):
+    bulk, bulk_calls = solve(True, pol)
+    single, single_calls = solve(False, pol)
+    assert bulk_calls < single_calls
+    assert bulk.wavl == single.wavl and isinstance(bulk.wavl, float)
+    assert bulk.n_effs == single.n_effs and bulk.n_grps == single.n_grps
+    assert bulk.loss == single.loss
+    for name in ("xaxis", "yaxis", "index", "E_field", "H_field"):
+        assert np.array_equal(np.asarray(getattr(bulk, name)), np.asarray(getattr(single, name)))
+
+def test_sweep_and_tracking():
+    with FDEModeSimulation(component()) as sim:
+        sim.setup_sim(1.55e-6)
+        data = sim.run_sweep(1.55e-6, 0.1e-6, 5)
+        assert np.all(np.diff(np.real(data.n_effs)) < 0)
+        mode, overlap = sim.track_mode(1.56e-6, sim.solve_mode(1.55e-6))
+        assert overlap > 0.99
+
+def test_parametric_sweep_points_solve():
+    points = grid(width=[0.8e-6, 1e-6], wavl=[1.5e-6, 1.6e-6])
+    results = ParametricSweep(component(), points, workers=0).collect()
+    assert not any(isinstance(r, Exception) for r in results)
+    assert [r.wavl for r in results] == [p["wavl"] for p in points]
+
+def test_area_weights_follow_replaced_axes(mode_data):
+    before = mode_data.dxdy.sum()
+    n = len(mode_data.xaxis)
+    for i in range(20):  # a freed axis must not be mistaken for its replacement
+        mode_data.xaxis = None
+        x = np.empty(n)  # likely to reuse the memory, and id, of the old axis
+        x[:] = np.linspace(-1e-6, 1e-6, n)*(i + 2)
+        mode_data.xaxis = x
+        del x
+        assert np.isclose(mode_data.dxdy.sum(), 2e-6*(i + 2)*np.ptp(mode_data.yaxis))
+    assert before != mode_data.dxdy.sum()
+
+@pytest.mark.parametrize("fraction", [0.9, 0.99])
+def test_crop_window_of_gaussian(fraction):
+    from scipy.special import erfinv
+    from pylum.fdemode import FDEModeSimData
+    x, y = np.linspace(-3e-6, 3e-6, 121), np.linspace(-2e-6, 2e-6, 81)
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    x0, y0, w = [0.4e-6, -0.3e-6], [-0.2e-6, 0.1e-6], [(0.8e-6, 0.5e-6), (0.6e-6, 0.5e-6)]
+    E = np.array([np.exp(-((X - a)**2/wx**2 + (Y - b)**2/wy**2)/2) + 0j
+        for a, b, (wx, wy) in zip(x0, y0, w)])  # S_z ~ exp(-(x/wx)^2 - (y/wy)^2)
+    z = 0*E
+    fields = np.stack([E, z, z, z, E, z], axis=1)
+    data = FDEModeSimData.from_fields(x, y, None, [1.5e-6, 1.6e-6], fields, 1., 1., 0.)
+    sx, sy = data.crop_window(fraction)
+    S = np.abs(E)**2*data.dxdy
+    assert (S[:, sx, sy].sum(axis=(1, 2))/S.sum(axis=(1, 2))).min() >= fraction
+    crop = data.auto_crop(fraction)
+    assert np.array_equal(crop.xaxis, x[sx]) and np.shares_memory(crop.fields, data.fields)
+    # one wavelength alone: the smallest rectangle has erf(a/wx) = erf(b/wy) = sqrt(fraction)
+    sx, sy = FDEModeSimData.from_fields(x, y, None, 1.5e-6, fields[0], 1., 1., 0.).crop_window(fraction)
+    u = erfinv(np.sqrt(fraction))
+    for axis, s, c, half in ((x, sx, x0[0], u*w[0][0]), (y, sy, y0[0], u*w[0][1])):
+        assert np.allclose(axis[s][[0, -1]] - c, [-half, half], atol=2*(axis[1] - axis[0]))
+
+def test_save_over_own_directory(tmp_path, mode_data):
+    from pylum.fdemode import FDEModeSimData
+    path = str(tmp_path/"mode")
+    mode_data.save(path)
+    loaded = FDEModeSimData.load(path)
+    loaded.n_effs = 3.
+    loaded.save(path)
+    again = FDEModeSimData.load(path)
+    assert again.n_effs == 3.
+    assert np.array_equal(np.asarray(again.E_field), np.asarray(mode_data.E_field))
+    assert np.array_equal(np.asarray(loaded.E_field), np.asarray(mode_data.E_field))
+
+def test_load_complex64(tmp_path, mode_data):
+    from pylum.fdemode import FDEModeSimData
+    mode_data.astype(np.complex64).save(str(tmp_path/"single"))
+    mode_data.save(str(tmp_path/"double"))
+    single = FDEModeSimData.load(str(tmp_path/"single"))
+    cast = FDEModeSimData.load(str(tmp_path/"double"), dtype=np.complex64)
+    assert single.fields.dtype == cast.fields.dtype == np.complex64
+    assert np.array_equal(single.fields, cast.fields)
+    assert np.allclose(cast.fields, mode_data.fields, rtol=1e-6, atol=1e-7)
+
+@pytest.mark.parametrize("written, field_dtype", [(None, np.complex64), (np.complex64, None)])
+def test_resumed_sweep_keeps_field_dtype(tmp_path, written, field_dtype):
+    def sweep(field_dtype, journal=None):
+        with FDEModeSimulation(component(), field_dtype=field_dtype) as sim:
+            sim.setup_sim(1.55e-6)
+            return sim.run_sweep(1.55e-6, 0.1e-6, 4, journal=journal)
+    journal = str(tmp_path/"journal")
+    direct = sweep(field_dtype)
+    sweep(written, journal)
+    os.remove(os.path.join(journal, "point_2.npz"))
+    resumed = sweep(field_dtype, journal)
+    assert direct.fields.dtype == (complex if field_dtype is None else field_dtype)
+    assert resumed.fields.dtype == direct.fields.dtype
+    assert np.allclose(resumed.fields, direct.fields, rtol=1e-6, atol=1e-7)
+
+def test_search_settings_kept_unless_tracking():
+    with FDEModeSimulation(component()) as sim:
+        sim.setup_sim(1.55e-6)
+        sim.mode.setanalysis("use max index", False)
+        sim.mode.setanalysis("n", 2.45)
+        sim.solve_mode(1.55e-6)
+        assert sim.mode.getanalysis("use max index") == 0
+        assert sim.mode.getanalysis("n") == 2.45
+        sim.track_mode(1.56e-6, sim.solve_mode(1.55e-6))
+        assert sim.mode.getanalysis("use max index") == 0
+        sim.solve_mode(1.55e-6)
+        assert sim.mode.getanalysis("use max index") == 1
+
+def test_points_do_not_inherit_parameters():
+    points = [dict(width=1e-6, wavl=1.55e-6), dict(etch=0.2e-6, wavl=1.55e-6)]
+    c = component()
+    base = base_values(c, points)
+    for p in points:
+        apply_point(c, p, base)
+    assert (c.wg.width, c.wg.etch) == (0.8e-6, 0.2e-6)
+    apply_point(c, points[0], base)
+    assert (c.wg.width, c.wg.etch) == (1e-6, 0.3e-6)
+
+def test_parallel_sweep_matches_serial():
+    points = grid(width=[0.8e-6, 1e-6], etch=[0.2e-6, 0.3e-6]) + [dict(height=0.7e-6)]
+    serial = ParametricSweep(component(), points, 1.55e-6, workers=0).collect()
+    parallel = ParametricSweep(component(), points, 1.55e-6, workers=2,
+        chunks_per_worker=1).collect()
+    for a, b in zip(serial, parallel):
+        assert not isinstance(b, Exception), b
+        assert a.n_effs == b.n_effs
+        assert np.array_equal(a.xaxis, b.xaxis) and np.array_equal(a.fields, b.fields)
+
+def session_state(session):
+    return dict((path, (kind, dict(props))) for path, kind, props in session.snapshot())
+
+@pytest.mark.parametrize("batch", [False, True])
+@pytest.mark.parametrize("param, step", [("width", 0.05e-6), ("etch", -0.05e-6)])
+def test_incremental_step_matches_rebuild(batch, param, step):
+    def setup(incremental, value):
+        wg = Waveguide(0.8e-6, 0.6e-6, 0.3e-6)
+        sim = FDEModeSimulation(RidgeWaveguide(wg, materials, batch, incremental))
+        sim.setup_sim(1.55e-6)
+        before = session_state(sim.mode)
+        sim.mode.reset_counts()
+        setattr(wg, param, value)
+        sim.setup_sim(1.55e-6)
+        state = session_state(sim.mode)
+        changed = sum(len(set(props.items()) - set(before[path][1].items()))
+            for path, (kind, props) in state.items())
+        return sim, state, changed
+    value = getattr(Waveguide(0.8e-6, 0.6e-6, 0.3e-6), param) + step
+    stepped, state, changed = setup(True, value)
+    rebuilt, rebuilt_state, _ = setup(False, value)
+    assert state == rebuilt_state
+    # besides the changed properties: switchtolayout, the FDE and mesh checks
+    assert stepped.mode.calls <= changed + 4
+    assert stepped.mode.calls < rebuilt.mode.calls
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+from conftest import root
+
+script = """
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location("pylum", sys.argv[1] + "/__init__.py",
+    submodule_search_locations=[sys.argv[1]])
+module = importlib.util.module_from_spec(spec)
+sys.modules["pylum"] = module
+spec.loader.exec_module(module)
+import pylum.localmode, pylum.tools.perturbation
+import lumapi
+if lumapi.__doc__ == "Lumerical API (not available)":
+    try:
+        lumapi.MODE(hide=True)
+    except RuntimeError as e:
+        assert "Lumerical" in str(e)
+    else:
+        raise AssertionError("MODE() of the stand-in did not raise")
+"""
+
+def test_localmode_without_lumerical():
+    env = {k: v for k, v in os.environ.items() if k != "PYLUM_LUMAPI"}
+    result = subprocess.run([sys.executable, "-c", script, root], env=env,
+        capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,14 @@
+import numpy as np
+from pylum.sweeps.journal import SweepJournal
+from pylum.tools.farfield import farfield
+
+def test_load_point_round_trip(tmp_path, mode_data):
+    journal = SweepJournal(str(tmp_path), {"sweep": 1})
+    journal.add_data(0, mode_data)
+    loaded = journal.load_point(0)
+    assert isinstance(loaded.wavl, float)
+    assert loaded.n_effs == mode_data.n_effs
+    assert np.ndim(loaded.compute_Aeff()) == 0
+    assert np.allclose(loaded.compute_Aeff(), mode_data.compute_Aeff())
+    for a, b in zip(farfield(loaded, 1e-3), farfield(mode_data, 1e-3)):
+        assert a.shape == b.shape and np.allclose(a, b)
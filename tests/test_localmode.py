@@ -0,0 +1,29 @@
+from collections import OrderedDict
+
+import pytest
+from pylum.fdemode import FDEModeSimulation
+from pylum.localmode import LocalModeSimulation
+from pylum.component.ridge_wg import RidgeWaveguide, Waveguide
+from pylum.material import dielectrics
+
+materials = OrderedDict([("subs_mat", dielectrics.silica), ("core_mat", dielectrics.silicon),
+    ("cap_mat", dielectrics.silica)])
+index = {dielectrics.silica: 1.444, dielectrics.silicon: 3.476}
+
+def simulations():
+    component = lambda: RidgeWaveguide(Waveguide(0.5e-6, 0.22e-6, 0.22e-6), materials)
+    return FDEModeSimulation(component()), LocalModeSimulation(component(), index)
+
+def test_setup_sim_positional_arguments_match():
+    args = (1.55e-6, 0., "structure", False, 1e-6, 2e-6, True, 20e-9, 20e-9,
+        ['PML']*4, 0., 1.2, 25)
+    fde, local = simulations()
+    fde.setup_sim(*args)
+    local.setup_sim(*args)
+    assert dict((k, local.setup_args[k]) for k in fde.setup_args) == fde.setup_args
+    assert fde.layout().describe() == local.layout().describe()
+
+def test_symmetry_refused():
+    fde, local = simulations()
+    with pytest.raises(ValueError):
+        local.setup_sim(1.55e-6, 0., "structure", True)
@@ -0,0 +1,29 @@
+import numpy as np
+from pylum.fdemode import FDEModeSimData
+from pylum.tools.modematch import best_gaussian, gaussian_coupling, gaussian_overlap
+
+def gaussian_mode(wx, wy, ax=0., ay=0.):
+    x = np.linspace(-8e-6, 8e-6, 161)
+    y = np.concatenate((np.linspace(-8e-6, -4e-6, 21)[:-1], np.linspace(-4e-6, 8e-6, 241)))
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    E = np.exp(-((X - ax)/wx)**2 - ((Y - ay)/wy)**2) + 0j
+    z = 0*E
+    return FDEModeSimData(x, y, 1.5 + 0*X, 1.55e-6, [E, z, z], [z, E/376.73, z], 1.5, 1.5, 0.)
+
+def test_coupling_matches_closed_form():
+    data = gaussian_mode(1.2e-6, 0.8e-6, 0.3e-6, -0.2e-6)
+    mfd = np.array([1.5e-6, 2.5e-6, 4e-6])
+    x0, y0 = np.array([-0.5e-6, 0., 0.4e-6]), np.array([-0.3e-6, 0.5e-6])
+    eta = gaussian_coupling(data, mfd, x0, y0)
+    expected = gaussian_overlap(2.4e-6, mfd[:, None, None], 0.3e-6 - x0[None, :, None],
+        -0.2e-6 - y0[None, None, :], mfd1_y=1.6e-6)
+    assert eta.shape == (3, 3, 2)
+    assert np.allclose(eta, expected, rtol=1e-4)
+
+def test_best_gaussian_recovers_beam():
+    data = gaussian_mode(1.28e-6, 1.28e-6, 0.22e-6, -0.13e-6)
+    grid = np.linspace(-0.5e-6, 0.5e-6, 11)
+    eta, mfd, x0, y0 = best_gaussian(data, np.linspace(1.5e-6, 3.5e-6, 11), grid, grid)
+    assert eta > 0.999
+    assert abs(mfd - 2.56e-6) < 0.03*2.56e-6
+    assert abs(x0 - 0.22e-6) < 0.02e-6 and abs(y0 + 0.13e-6) < 0.02e-6
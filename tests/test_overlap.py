@@ -0,0 +1,47 @@
+import numpy as np
+from pylum.fdemode import FDEModeSimData
+from pylum.tools.overlap import interp_matrix, mode_overlap, overlap_matrix, resample
+
+x, y = np.linspace(-2e-6, 2e-6, 41), np.linspace(-1.5e-6, 1.5e-6, 31)
+X, Y = np.meshgrid(x, y, indexing="ij")
+
+def fields(ax, w, wavl=1.55e-6):  # TE-like Gaussian, (6, Nx, Ny)
+    E = np.exp(-((X - ax)**2 + Y**2)/w**2)*(1 + 0.1j*X/1e-6)
+    z = 0*E
+    return np.array([E, z, z, z, 2.1*E/376.73, z])
+
+def mode(F, wavl=1.55e-6):
+    return FDEModeSimData.from_fields(x, y, 1.5 + 0*X, wavl, F, 1., 1., 0.)
+
+def test_self_overlap_is_one():
+    m = mode(fields(0.2e-6, 0.7e-6))
+    assert np.isclose(mode_overlap(m, m), 1)
+    assert np.isclose(overlap_matrix([m], [m])[0, 0], 1)
+    assert mode_overlap(m, mode(fields(-0.3e-6, 0.5e-6))) < 0.9
+
+def test_sweep_matches_loop():
+    wavls = [1.5e-6, 1.55e-6, 1.6e-6]
+    sets = [[np.array([fields(a*k, w) for k in range(3)]) for a, w in pairs]
+        for pairs in ([(0.1e-6, 0.6e-6), (-0.2e-6, 0.8e-6)], [(0., 0.5e-6), (0.3e-6, 0.7e-6)])]
+    modes1, modes2 = [[mode(F, wavls) for F in s] for s in sets]
+    batched = overlap_matrix(modes1, modes2)
+    looped = [overlap_matrix([mode(F[k]) for F in sets[0]], [mode(F[k]) for F in sets[1]])
+        for k in range(3)]
+    assert batched.shape == (3, 2, 2)
+    assert np.allclose(batched, looped, rtol=1e-12)
+
+def test_interpolation_zero_outside():
+    new = np.linspace(-3e-6, 3e-6, 61)
+    L = interp_matrix(x, new)
+    outside = (new < x[0]) | (new > x[-1])
+    assert np.all(L[outside] == 0)
+    assert np.allclose(L[~outside].sum(axis=1), 1)
+    R = resample(np.ones((41, 31)), x, y, new, np.linspace(-2e-6, 2e-6, 41))
+    assert R[outside].max() == 0 and np.allclose(R[~outside][:, 5:-5], 1)
+    m = mode(fields(0.1e-6, 0.6e-6))  # the same mode on a finer mesh
+    xf, yf = np.linspace(-2e-6, 2e-6, 81), np.linspace(-1.5e-6, 1.5e-6, 61)
+    Xf, Yf = np.meshgrid(xf, yf, indexing="ij")
+    E = np.exp(-((Xf - 0.1e-6)**2 + Yf**2)/0.6e-6**2)*(1 + 0.1j*Xf/1e-6)
+    z = 0*E
+    fine = FDEModeSimData(xf, yf, 0*Xf, 1.55e-6, [E, z, z], [z, 2.1*E/376.73, z], 1., 1., 0.)
+    assert np.isclose(overlap_matrix([m], [fine])[0, 0], 1, atol=1e-4)
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from pylum.localmode import LocalModeSimulation
+from pylum.component.ridge_wg import RidgeWaveguide, Waveguide
+from pylum.material import dielectrics
+from pylum.material.indexmodels import Si
+from pylum.tools.perturbation import boundary_shift, constant, dneff_dT
+
+wavl = 1.55e-6
+materials = OrderedDict([("subs_mat", dielectrics.silica), ("core_mat", dielectrics.silicon),
+    ("cap_mat", dielectrics.silica)])
+index = {dielectrics.silica: 1.444, dielectrics.silicon: 3.476}
+
+def solve(sim):
+    sim.setup_sim(wavl, cap_thickness=1e-6, mesh=True, dx_mesh=20e-9, dy_mesh=20e-9)
+    return sim.find_modes(wavl, 1)[0]
+
+@pytest.mark.parametrize("name, rel", [("width", 0.1), ("etch", 0.15)])
+def test_rib_matches_finite_differences(name, rel):
+    # the sidewalls of a rib end on the slab, in re-entrant corners
+    wg = Waveguide(0.6e-6, 0.22e-6, 0.1e-6)
+    sim = LocalModeSimulation(RidgeWaveguide(wg, materials), index, subsamples=16)
+    data, before = solve(sim), sim.layout()
+    value, step = getattr(wg, name), 5e-9
+    setattr(wg, name, value + 1e-9)
+    after = sim.layout()
+    setattr(wg, name, value + step)
+    plus = solve(sim).n_effs
+    setattr(wg, name, value - step)
+    minus = solve(sim).n_effs
+    setattr(wg, name, value)
+    expected = (plus - minus).real/(2*step)
+    assert boundary_shift(data, before, after).real/1e-9 == pytest.approx(expected, rel=rel)
+
+def one_sided(sim, wg, names, step=5e-9):
+    """Mode at the current geometry, the layouts before and 1 nm after
+    moving names together, and the finite difference of n_eff for a move of
+    step, on one mesh holding the edges of all three geometries."""
+    def move(d):
+        for name in names:
+            setattr(wg, name, getattr(wg, name) + d)
+    axes = []
+    for d in (step, 0):
+        move(d)
+        sim.setup_sim(wavl, cap_thickness=1e-6, mesh=True, dx_mesh=20e-9, dy_mesh=20e-9)
+        axes.append((sim.xaxis, sim.yaxis))
+        move(-d)
+    def solve_shared(d):
+        move(d)
+        sim.setup_sim(wavl, cap_thickness=1e-6, mesh=True, dx_mesh=20e-9, dy_mesh=20e-9)
+        sim.xaxis, sim.yaxis = (np.union1d(a, b) for a, b in zip(*axes))
+        move(-d)
+        return sim.find_modes(wavl, 1)[0]
+    moved = solve_shared(step).n_effs
+    data, before = solve_shared(0), sim.layout()
+    move(np.sign(step)*1e-9)
+    after = sim.layout()
+    move(-np.sign(step)*1e-9)
+    return data, before, after, (moved - data.n_effs).real/step
+
+@pytest.mark.parametrize("etch, names, step, rel", [
+    (0.1e-6, ["width"], 5e-9, 0.05), (0.1e-6, ["height"], 5e-9, 0.05),
+    (0.1e-6, ["etch"], -5e-9, 0.05), (0.22e-6, ["width"], 5e-9, 0.05),
+    (0.22e-6, ["height"], 5e-9, 0.05), (0.22e-6, ["height"], -5e-9, 0.05),
+    (0.22e-6, ["height", "etch"], 5e-9, 0.1), (0.22e-6, ["etch"], -5e-9, 0.1)])
+def test_one_sided_finite_differences(etch, names, step, rel):
+    # a strip (etch == height) gains a slab when its height is raised or its etch lowered
+    wg = Waveguide(0.6e-6, 0.22e-6, etch)
+    sim = LocalModeSimulation(RidgeWaveguide(wg, materials), index, subsamples=16)
+    data, before, after, expected = one_sided(sim, wg, names, step)
+    shift = boundary_shift(data, before, after).real/(np.sign(step)*1e-9)
+    assert shift == pytest.approx(expected, rel=rel)
+
+def test_strip_etch_beyond_height_changes_nothing():
+    wg = Waveguide(0.6e-6, 0.22e-6, 0.22e-6)
+    sim = LocalModeSimulation(RidgeWaveguide(wg, materials), index, subsamples=16)
+    data, before, after, expected = one_sided(sim, wg, ["etch"], 5e-9)
+    assert boundary_shift(data, before, after) == 0
+    assert expected == pytest.approx(0, abs=1e3)
+
+@pytest.mark.parametrize("etch", [0.1e-6, 0.22e-6])
+def test_dneff_dT_matches_finite_differences(etch):
+    T0, models = 295., [Si.NASA, constant(1.444, 1e-5, 295.)]
+    sim = LocalModeSimulation(RidgeWaveguide(Waveguide(0.6e-6, 0.22e-6, etch), materials),
+        {dielectrics.silicon: models[0], dielectrics.silica: models[1]}, subsamples=16)
+    def solve(T):
+        sim.setup_sim(wavl, cap_thickness=1e-6, mesh=True, dx_mesh=20e-9, dy_mesh=20e-9,
+            T=T - 273.15)
+        return sim.find_modes(wavl, 1)[0]
+    data = solve(T0)
+    expected = (solve(T0 + 10).n_effs - solve(T0 - 10).n_effs).real/20
+    assert dneff_dT(data, models, T0).real == pytest.approx(expected, rel=0.06)
@@ -0,0 +1,48 @@
+import pytest
+from pylum import fakelumapi
+from pylum.session import SessionPool
+from pylum.fdtd import FDTDSimulation
+from pylum.fdemode import FDEModeSimulation
+from pylum.component.grating import GratingEnvironment
+
+@pytest.mark.parametrize("simulation", [FDTDSimulation, FDEModeSimulation, GratingEnvironment])
+def test_close_twice_releases_once(simulation):
+    with SessionPool(fakelumapi.FDTD, max_sessions=2) as pool:
+        with simulation(0.6e-6 if simulation is GratingEnvironment else None, pool=pool) as sim:
+            if simulation is FDEModeSimulation:
+                sim.mode
+            sim.close()
+        assert pool.idle == 1
+        a, b = pool.acquire(), pool.acquire()
+        assert a is not b
+
+def test_release_idle_session_refused():
+    with SessionPool(fakelumapi.MODE) as pool:
+        s = pool.acquire()
+        pool.release(s)
+        with pytest.raises(ValueError):
+            pool.release(s)
+        assert pool.idle == 1
+
+def test_start_does_not_wait_for_handed_out_sessions():
+    with SessionPool(fakelumapi.MODE, max_sessions=2) as pool:
+        a, b = pool.acquire(), pool.acquire()
+        pool.start(2)
+        assert len(pool) == 2 and pool.idle == 0
+        pool.release(a)
+        pool.start(2)
+        assert pool.idle == 1
+        pool.release(b)
+    with SessionPool(fakelumapi.MODE, max_sessions=3) as pool:
+        a = pool.acquire()
+        pool.start(3)
+        assert len(pool) == 3 and pool.idle == 2
+
+def test_release_restores_search_settings():
+    with SessionPool(fakelumapi.MODE) as pool:
+        with FDEModeSimulation(None, pool=pool) as sim:
+            sim.mode.setanalysis("use max index", False)
+            sim.mode.setanalysis("bent waveguide", True)
+        s = pool.acquire()
+        assert s.getanalysis("use max index") == 1
+        assert s.getanalysis("bent waveguide") == 0
@@ -0,0 +1,20 @@
+import warnings
+import numpy as np
+import pytest
+from pylum.material.indexmodels import MgOLN, Si
+from pylum.material.indexmodels.tabulated import Tabulated
+
+def test_unmet_tol_warns():
+    with pytest.warns(RuntimeWarning, match="max_points"):
+        tab = Tabulated(Si.NASA, (1.2e-6, 4e-6), (200., 500.), max_points=2**12)
+    assert tab.error > 1e-6
+
+def test_error_is_midpoint_estimate():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        tab = Tabulated(MgOLN.gayer2008_e, (0.5e-6, 4e-6), (250., 450.))
+    rng = np.random.default_rng(0)
+    wavl, T = rng.uniform(0.5e-6, 4e-6, 10**4), rng.uniform(250., 450., 10**4)
+    err = np.abs(tab(wavl, T) - MgOLN.gayer2008_e(wavl, T)).max()
+    assert tab.error <= 1e-6
+    assert err < 10*tab.error
@@ -0,0 +1,83 @@
+"""
+Purpose:    Dispersion of a mode from its n_eff(λ) samples, without extra solves.
+            Derivatives of n_eff with respect to wavelength are taken on the
+            (possibly non-uniform) wavelength grid of a sweep, either from an
+            interpolating spline or from finite-difference stencils whose
+            weights are solved for all samples at once.
+                n_g   = n - λ n'
+                β2    = λ³/(2π c²) n''                        [s²/m]
+                β3    = -λ⁴/(4π² c³) (3 n'' + λ n''')          [s³/m]
+                walk-off between modes a, b = (n_g,a - n_g,b)/c  [s/m]
+            Wavelengths in m, derivatives per m.
+Copyright:  (c) 2021 David Heydari
+"""
+
+import numpy as np
+from math import factorial
+import scipy.constants as consts
+from scipy.interpolate import make_interp_spline
+pi = np.pi
+c0 = consts.c
+
+def fd_weights(x, order, stencil=5):
+    """Weights W (N, N) such that W @ y is the order-th derivative of y(x) at
+    every x, from the stencil nearest samples of each point."""
+    x = np.asarray(x, dtype=float)
+    N = len(x)
+    stencil = min(stencil, N)
+    if stencil <= order:
+        raise ValueError("Need more than " + str(order) + " samples for derivative order " + str(order))
+    starts = np.clip(np.arange(N) - stencil//2, 0, N - stencil)
+    cols = starts[:,None] + np.arange(stencil)  # (N, stencil) sample indices
+    h = np.ptp(x)/(N - 1)
+    dx = (x[cols] - x[:,None])/h
+    k = np.arange(stencil)
+    A = dx[:,None,:]**k[None,:,None]/np.array([factorial(j) for j in k])[None,:,None]
+    rhs = np.zeros((N, stencil))
+    rhs[:,order] = 1
+    w = np.linalg.solve(A, rhs[...,None])[...,0]/h**order
+    W = np.zeros((N, N))
+    np.put_along_axis(W, cols, w, axis=1)
+    return W
+
+def derivatives(wavl, n, orders=(1, 2, 3), method="spline", stencil=5):
+    """Derivatives of n (N,) or (N, ...) with respect to wavl (N,), which need
+    not be sorted or uniform; one array per entry of orders."""
+    wavl = np.asarray(wavl, dtype=float)
+    n = np.asarray(n)
+    order = np.argsort(wavl)
+    x, y = wavl[order], n[order]
+    if method == "spline":
+        spl = make_interp_spline(x, y, k=min(5, len(x) - 1))
+        d = [spl.derivative(m)(x) if m else y for m in orders]
+    elif method == "fd":
+        d = [np.tensordot(fd_weights(x, m, stencil), y, axes=1) for m in orders]
+    else:
+        raise ValueError("Unknown method: " + method)
+    inv = np.argsort(order)
+    return [di[inv] for di in d]
+
+def group_index(wavl, n, **kwargs):
+    n1, = derivatives(wavl, n, (1,), **kwargs)
+    return n - np.reshape(wavl, (-1,) + (1,)*(np.ndim(n) - 1))*n1
+
+def beta2(wavl, n, **kwargs):
+    n2, = derivatives(wavl, n, (2,), **kwargs)
+    wl = np.reshape(wavl, (-1,) + (1,)*(np.ndim(n) - 1))
+    return wl**3/(2*pi*c0**2)*n2
+
+def beta3(wavl, n, **kwargs):
+    n2, n3 = derivatives(wavl, n, (2, 3), **kwargs)
+    wl = np.reshape(wavl, (-1,) + (1,)*(np.ndim(n) - 1))
+    return -wl**4/(4*pi**2*c0**3)*(3*n2 + wl*n3)
+
+def walkoff(wavl_a, n_a, wavl_b, n_b, **kwargs):
+    """Group delay difference per length (1/v_g,a - 1/v_g,b) on the
+    wavelengths of a; n_g,b is interpolated when the grids differ."""
+    ng_a = group_index(wavl_a, n_a, **kwargs)
+    ng_b = group_index(wavl_b, n_b, **kwargs)
+    if not np.array_equal(np.asarray(wavl_a), np.asarray(wavl_b)):
+        order = np.argsort(wavl_b)
+        spl = make_interp_spline(np.asarray(wavl_b)[order], ng_b[order], k=min(3, len(order) - 1))
+        ng_b = spl(wavl_a)
+    return (ng_a - ng_b)/c0
@@ -1,23 +1,125 @@
 """
 Purpose:    Computes far field of a given FDFD data set by way of Fraunhofer (Fourier)      
             transform.  Formalism is described in notes.
-            Can also increase the resolution of the FFT 
-            by zero-padding the data.
+            The zero-padding of the FFT is chosen from the requested angular
+            resolution (dθ ≈ λ0/(N dx)) and rounded up to a fast FFT size.
+            Only propagating directions (|sin θ| <= na) are kept: the
+            transform is done one axis at a time and cropped in between, so
+            the padded 2D array is never formed.  Whole sweeps (E_field of
+            shape (N, 3, Nx, Ny)) and several distances are done in one call.
+            farfield_zoom evaluates the same integral on a small window of
+            angles at any sample count with chirp-z transforms of the
+            unpadded field, for fine resolution around one direction.
+            FDE results usually come on a non-uniform (conformal/override)
+            mesh; there both functions use a direct transform with
+            trapezoidal quadrature weights instead of the FFT.  It is
+            separable, so it costs two matrix products per wavelength on the
+            output directions only.
 Copyright:   (c) Jan 2021 David Heydari
 """
 
 import numpy as np
-from numpy.fft import fft, fft2, fftshift, fftfreq
+import scipy.fft as sfft
+from scipy.signal import ZoomFFT
+from .overlap import cell_widths
+from numpy.fft import fftshift, fftfreq
 π = np.pi
 
-def farfield(fde_sim_data_i, d_farfield, pad_number=3000):
-    λ0 = fde_sim_data_i.wavl
-    k = 2*np.pi/λ0
-    new_E = np.pad(fde_sim_data_i.E_field[0], pad_number, mode="constant")
+def fft_size(n, dx, λ0, resolution):
+    """FFT length for n samples at spacing dx giving an angular step of
+    about resolution (rad) at wavelength λ0."""
+    return sfft.next_fast_len(max(n, int(np.ceil(λ0/(dx*resolution)))))
+
+def uniform(axis, rtol=1e-6):
+    d = np.diff(axis)
+    return np.ptp(d) <= rtol*np.abs(d).max()
+
+def _freqs(n, d, na_λ):  # FFT frequencies (shifted) with |f| <= na_λ
+    f = fftshift(fftfreq(n, d))
+    keep = np.nonzero(np.abs(f) <= na_λ)[0]
+    return f[keep], keep
+
+def _pruned_fft(E, n, d, axis, na_λ, workers):
+    """Padded FFT of E along axis, fftshifted and cropped to |f| <= na_λ."""
+    f, keep = _freqs(n, d, na_λ)
+    F = fftshift(sfft.fft(E, n=n, axis=axis, workers=workers), axes=axis)
+    return np.take(F, keep, axis=axis), f
+
+def direct_transform(E, xaxis, yaxis, fx, fy):
+    """∫∫ E(x, y) exp(-2πi (fx x + fy y)) dx dy for E of shape (..., Nx, Ny)
+    on a non-uniform mesh (trapezoidal rule); returns (..., len(fx), len(fy))."""
+    Kx = np.exp(-2j*π*np.outer(fx, xaxis))*cell_widths(xaxis)
+    Ky = np.exp(-2j*π*np.outer(fy, yaxis))*cell_widths(yaxis)
+    return Kx @ E @ Ky.T
+
+def farfield(fde_sim_data_i, d_farfield, pad_number=None, resolution=np.radians(1.),
+            na=1., workers=-1):
+    """Far-field amplitude of E_field[0] at distance(s) d_farfield.
+    Returns X, Y (positions in the far-field plane) and the amplitude, each of
+    shape (Ny', Nx') for one wavelength and distance; a sweep adds a leading
+    wavelength axis and an array of distances the axis after it.
+    pad_number (cells per side, as before) overrides resolution."""
+    sweep = isinstance(fde_sim_data_i.wavl, (list, np.ndarray))
+    λ0 = np.atleast_1d(np.asarray(fde_sim_data_i.wavl, dtype=float))
+    E = np.asarray(fde_sim_data_i.E_field)
+    Ex = E[:,0] if sweep else E[None,0]  # (N, Nx, Ny)
+    dx = np.diff(fde_sim_data_i.xaxis).min()
+    dy = np.diff(fde_sim_data_i.yaxis).min()
+    if pad_number is None:
+        nx = fft_size(Ex.shape[1], dx, λ0.max(), resolution)
+        ny = fft_size(Ex.shape[2], dy, λ0.max(), resolution)
+    else:
+        nx = sfft.next_fast_len(Ex.shape[1] + 2*pad_number)
+        ny = sfft.next_fast_len(Ex.shape[2] + 2*pad_number)
+    xaxis, yaxis = fde_sim_data_i.xaxis, fde_sim_data_i.yaxis
+    if uniform(xaxis) and uniform(yaxis):
+        # the origin of the padding does not matter: only |FFT| is kept
+        F, fx = _pruned_fft(Ex, nx, dx, 1, na/λ0.min(), workers)
+        F, fy = _pruned_fft(F, ny, dy, 2, na/λ0.min(), workers)
+        F *= dx*dy
+    else:  # same output directions, from the non-uniform mesh directly
+        fx, fy = _freqs(nx, dx, na/λ0.min())[0], _freqs(ny, dy, na/λ0.min())[0]
+        F = direct_transform(Ex, xaxis, yaxis, fx, fy)
+    A = np.abs(F).transpose(0, 2, 1)  # (N, Ny', Nx')
+    d = np.asarray(d_farfield, dtype=float)
+    scale = (λ0.reshape((-1,) + (1,)*d.ndim)*d)[..., None, None]  # λ0 d
+    FX, FY = np.meshgrid(fx, fy)
+    X, Y = FX*scale, FY*scale
+    farfield = A.reshape(A.shape[:1] + (1,)*d.ndim + A.shape[1:])/scale
+    if not sweep:
+        X, Y, farfield = X[0], Y[0], farfield[0]
+    return X, Y, farfield
+
+def farfield_zoom(fde_sim_data_i, d_farfield, theta_x=np.radians([-5., 5.]),
+            theta_y=np.radians([-5., 5.]), n=(201, 201)):
+    """Far-field amplitude of E_field[0] on the window of angles theta_x,
+    theta_y (rad, ends included) with n = (nx, ny) samples, uniform in sin θ.
+    Returns X, Y and the amplitude with the same shapes as farfield."""
+    sweep = isinstance(fde_sim_data_i.wavl, (list, np.ndarray))
+    λ0 = np.atleast_1d(np.asarray(fde_sim_data_i.wavl, dtype=float))
+    E = np.asarray(fde_sim_data_i.E_field)
+    Ex = E[:,0] if sweep else E[None,0]  # (N, Nx, Ny)
     dx = np.diff(fde_sim_data_i.xaxis).min()
     dy = np.diff(fde_sim_data_i.yaxis).min()
-    X, Y = fftfreq(new_E.shape[0], dx)*(λ0*d_farfield), fftfreq(new_E.shape[1], dy)*(λ0*d_farfield)
-    XXpf, YYpf =  np.meshgrid(X,Y)
-    prefactor = 1J * np.exp(-1J*k*d_farfield) * np.exp( -1J*π* (XXpf**2+YYpf**2) / (λ0*d_farfield) )
-    farfield = dx * dy / (λ0 * d_farfield) * abs(prefactor * fftshift(fft2(new_E.T)))
-    return fftshift(XXpf), fftshift(YYpf), farfield
\ No newline at end of file
+    sx, sy = np.sin(theta_x), np.sin(theta_y)
+    nx, ny = n
+    xaxis, yaxis = fde_sim_data_i.xaxis, fde_sim_data_i.yaxis
+    on_grid = uniform(xaxis) and uniform(yaxis)
+    A = np.empty((len(λ0), ny, nx))
+    for i, λ in enumerate(λ0):
+        if on_grid:
+            zx = ZoomFFT(Ex.shape[1], sx/λ, nx, fs=1/dx, endpoint=True)
+            zy = ZoomFFT(Ex.shape[2], sy/λ, ny, fs=1/dy, endpoint=True)
+            A[i] = dx*dy*np.abs(zy(zx(Ex[i], axis=0), axis=1)).T
+        else:
+            A[i] = np.abs(direct_transform(Ex[i], xaxis, yaxis,
+                np.linspace(*sx/λ, nx), np.linspace(*sy/λ, ny))).T
+    d = np.asarray(d_farfield, dtype=float)
+    dist = (np.ones((len(λ0),) + (1,)*d.ndim)*d)[..., None, None]
+    scale = λ0.reshape((-1,) + (1,)*(d.ndim + 2))*dist  # λ0 d
+    FX, FY = np.meshgrid(np.linspace(*sx, nx), np.linspace(*sy, ny))
+    X, Y = FX*dist, FY*dist  # sin θ d
+    farfield = A.reshape(A.shape[:1] + (1,)*d.ndim + A.shape[1:])/scale
+    if not sweep:
+        X, Y, farfield = X[0], Y[0], farfield[0]
+    return X, Y, farfield
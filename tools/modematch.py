@@ -1,11 +1,21 @@
 """
-Purpose:    Fits a Gaussian to a given FDFD mode set (FDEModeSimData).  
-            Useful for fiber mode matching calculations.  
+Purpose:    Fiber mode matching of FDFD modes (FDEModeSimData).
+            Power coupling between E_field[component] of a mode (or a whole
+            sweep) and Gaussian beams of given mode-field diameters and x/y
+            offsets:
+                η = |∫ E g dA|² / (∫|E|² dA  ∫|g|² dA),  g = exp(-r²/w²)
+            The Gaussian is separable, so all diameters, offsets and
+            wavelengths come out of two batched matrix products on the
+            (non-uniform) mesh,
+            and the best beam is found on that grid with parabolic
+            refinement instead of a nonlinear fit per mode.
+            Closed forms are given for Gaussian-Gaussian coupling and for the
+            mode-field diameter of a step-index fiber (Marcuse).
 Copyright:  (c) Jan 2021 David Heydari
 """
 
-from scipy.optimize import curve_fit
 import numpy as np
+from .overlap import cell_widths
 π = np.pi
 
 def w(z, w0, λ0):
@@ -16,6 +26,79 @@ def gaussbeam(λ0, x, x0, w0, d_farfield=0.):
     p = [x0, w0]
     return (p[1]/w(d_farfield, p[1], λ0))*np.exp(-2 * ((x-p[0])/p[1])**2)
 
-# p0 = [0., 3.]  # units: [μm]
-# fit, tmp = curve_fit(gaussbeam, fde_sim_data_i.xaxis*1e6,
-#                      np.real(fde_sim_data_i.E_field[0].T[cut_inds[1]]), p0=p0)
\ No newline at end of file
+def fiber_mfd(core_radius, NA, λ0):
+    """Mode-field diameter of the LP01 mode of a step-index fiber (Marcuse)."""
+    V = 2*π*core_radius*NA/λ0
+    return 2*core_radius*(0.65 + 1.619*V**-1.5 + 2.879*V**-6)
+
+def gaussian_overlap(mfd1, mfd2, dx=0., dy=0., mfd1_y=None, mfd2_y=None):
+    """Power coupling between two (elliptical) Gaussian beams with flat phase
+    fronts, offset by dx, dy; broadcasts over all arguments."""
+    w1x, w2x = np.asarray(mfd1)/2, np.asarray(mfd2)/2
+    w1y = w1x if mfd1_y is None else np.asarray(mfd1_y)/2
+    w2y = w2x if mfd2_y is None else np.asarray(mfd2_y)/2
+    sx, sy = w1x**2 + w2x**2, w1y**2 + w2y**2
+    return (2*w1x*w2x/sx)*(2*w1y*w2y/sy)*np.exp(-2*dx**2/sx - 2*dy**2/sy)
+
+def _kernel(axis, mfd, offsets):  # Gaussian rows (n_mfd, n_offsets, N) and their norms
+    w0 = np.asarray(mfd, dtype=float)[:, None, None]/2
+    r = axis[None, None, :] - np.asarray(offsets, dtype=float)[None, :, None]
+    g = np.exp(-(r/w0)**2)
+    return g*cell_widths(axis), (g**2*cell_widths(axis)).sum(axis=-1)
+
+def _fields(fde_sim_data_i, component):
+    sweep = isinstance(fde_sim_data_i.wavl, (list, np.ndarray))
+    E = np.asarray(fde_sim_data_i.E_field)
+    E = E[:, component] if sweep else E[None, component]  # (N, Nx, Ny)
+    xaxis = np.asarray(fde_sim_data_i.xaxis, dtype=float)
+    yaxis = np.asarray(fde_sim_data_i.yaxis, dtype=float)
+    P = np.einsum('nxy,x,y->n', np.abs(E)**2, cell_widths(xaxis), cell_widths(yaxis))
+    return sweep, E, xaxis, yaxis, P
+
+def gaussian_coupling(fde_sim_data_i, mfd, x0=0., y0=0., component=0):
+    """η for every mode-field diameter in mfd and offset in x0, y0, shape
+    (n_mfd, n_x0, n_y0), with a leading wavelength axis for a sweep."""
+    sweep, E, xaxis, yaxis, P = _fields(fde_sim_data_i, component)
+    mfd, x0, y0 = np.atleast_1d(mfd), np.atleast_1d(x0), np.atleast_1d(y0)
+    (Gx, Nx), (Gy, Ny) = _kernel(xaxis, mfd, x0), _kernel(yaxis, mfd, y0)
+    C = (Gx[None] @ E[:, None]) @ np.swapaxes(Gy, 1, 2)[None]  # (N, n_mfd, n_x0, n_y0)
+    eta = np.abs(C)**2/(P[:, None, None, None]*Nx[None, :, :, None]*Ny[None, :, None, :])
+    return eta if sweep else eta[0]
+
+def best_gaussian(fde_sim_data_i, mfd, x0=0., y0=0., component=0):
+    """Best-coupled Gaussian on the grid of mfd, x0, y0, refined by a
+    parabola through the neighbouring grid points along each axis.
+    Returns (η, mfd, x0, y0), arrays over wavelength for a sweep."""
+    grids = [np.atleast_1d(np.asarray(g, dtype=float)) for g in (mfd, x0, y0)]
+    sweep, E, xaxis, yaxis, P = _fields(fde_sim_data_i, component)
+    eta = gaussian_coupling(fde_sim_data_i, *grids, component=component)
+    eta = eta if sweep else eta[None]
+    flat = eta.reshape(len(eta), -1)
+    ind = np.unravel_index(flat.argmax(axis=1), eta.shape[1:])
+    rows = np.arange(len(eta))
+    best = []
+    for k, v in enumerate(grids):
+        i = ind[k]
+        if len(v) < 3:
+            best.append(v[i])
+            continue
+        j = np.clip(i, 1, len(v) - 2)
+        def at(m):
+            sel = list(ind)
+            sel[k] = m
+            return eta[(rows,) + tuple(sel)]
+        f0, fm, fp = at(j), at(j - 1), at(j + 1)
+        xm, x0_, xp = v[j - 1], v[j], v[j + 1]
+        num = (x0_ - xm)**2*(f0 - fp) - (x0_ - xp)**2*(f0 - fm)
+        den = (x0_ - xm)*(f0 - fp) - (x0_ - xp)*(f0 - fm)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            peak = x0_ - num/(2*den)
+        ok = (den != 0) & (i == j) & np.isfinite(peak)
+        best.append(np.where(ok, np.clip(peak, xm, xp), v[i]))
+    # η of the refined beam, one per wavelength
+    gx = np.exp(-((xaxis[None, :] - best[1][:, None])/(best[0][:, None]/2))**2)
+    gy = np.exp(-((yaxis[None, :] - best[2][:, None])/(best[0][:, None]/2))**2)
+    wx, wy = cell_widths(xaxis), cell_widths(yaxis)
+    C = np.einsum('nx,nxy,ny->n', gx*wx, E, gy*wy)
+    best.insert(0, np.abs(C)**2/(P*(gx**2*wx).sum(axis=1)*(gy**2*wy).sum(axis=1)))
+    return tuple(best) if sweep else tuple(b[0] for b in best)
@@ -0,0 +1,105 @@
+"""
+Purpose:    Overlap integrals between FDFD mode fields (FDEModeSimData) on a
+            (possibly non-uniform) rectangular mesh.
+            The power-normalized overlap of modes 1 and 2 is
+                | ∫(E1 x H2*)·z dA  ∫(E2 x H1*)·z dA |
+                --------------------------------------
+                 Re ∫(E1 x H1*)·z dA  Re ∫(E2 x H2*)·z dA
+            and lies between 0 and 1 (1 for identical modes).
+            overlap_matrix gives it for every pair of two sets of modes (and
+            every wavelength of a sweep) at once, as matrix products of the
+            flattened fields; a set on another mesh is interpolated onto the
+            mesh of the first set.
+Copyright:  (c) 2021 David Heydari
+"""
+
+import numpy as np
+
+def cell_widths(axis):
+    """Quadrature weights of a non-uniform 1D mesh (trapezoidal rule)."""
+    axis = np.asarray(axis, dtype=float)
+    if axis.size < 2:
+        return np.ones_like(axis)
+    d = np.diff(axis)
+    return np.concatenate(([d[0]/2], (d[:-1] + d[1:])/2, [d[-1]/2]))
+
+def area_weights(xaxis, yaxis):
+    return np.outer(cell_widths(xaxis), cell_widths(yaxis))
+
+def cross_z(E, H, dA):
+    """∫(E x H*)·z dA for fields stacked as (3, Nx, Ny)."""
+    E, H = np.asarray(E), np.asarray(H)
+    return ((E[0]*np.conj(H[1]) - E[1]*np.conj(H[0]))*dA).sum()
+
+def mode_overlap(mode1, mode2, dA=None):
+    """Power-normalized overlap of two single-wavelength FDEModeSimData
+    sharing a mesh."""
+    if np.shape(mode1.E_field) != np.shape(mode2.E_field):
+        raise ValueError("Modes are not on the same mesh")
+    if dA is None:
+        dA = area_weights(mode1.xaxis, mode1.yaxis)
+    E1, H1, E2, H2 = mode1.E_field, mode1.H_field, mode2.E_field, mode2.H_field
+    c12 = cross_z(E1, H2, dA)
+    c21 = cross_z(E2, H1, dA)
+    return np.abs(c12*c21 / (np.real(cross_z(E1, H1, dA))*np.real(cross_z(E2, H2, dA))))
+
+def interp_matrix(axis, new_axis):
+    """Linear interpolation from axis onto new_axis as a matrix
+    (len(new_axis), len(axis)); zero outside axis."""
+    axis, new_axis = np.asarray(axis, dtype=float), np.asarray(new_axis, dtype=float)
+    i = np.clip(np.searchsorted(axis, new_axis) - 1, 0, len(axis) - 2)
+    t = (new_axis - axis[i])/(axis[i+1] - axis[i])
+    inside = (t >= 0) & (t <= 1)
+    rows = np.arange(len(new_axis))
+    L = np.zeros((len(new_axis), len(axis)))
+    L[rows, i] = np.where(inside, 1 - t, 0)
+    L[rows, i+1] = np.where(inside, t, 0)
+    return L
+
+def resample(F, xaxis, yaxis, new_xaxis, new_yaxis):
+    """Fields F (..., Nx, Ny) interpolated onto another rectangular mesh."""
+    Lx, Ly = interp_matrix(xaxis, new_xaxis), interp_matrix(yaxis, new_yaxis)
+    return Lx @ F @ Ly.T
+
+def stack_fields(modes):
+    """E, H of a list of M FDEModeSimData as (M, 3, Nx, Ny) arrays, or
+    (N, M, 3, Nx, Ny) for sweeps over the same N wavelengths."""
+    E = np.stack([np.asarray(m.E_field) for m in modes], axis=-4)
+    H = np.stack([np.asarray(m.H_field) for m in modes], axis=-4)
+    return E, H
+
+def cross_z_matrix(E, H, dA):
+    """∫(E_a x H_b*)·z dA for all pairs a, b of E (..., Ma, 3, Nx, Ny) and
+    H (..., Mb, 3, Nx, Ny), shape (..., Ma, Mb)."""
+    w = np.ravel(dA)
+    Ex, Ey = _flat(E, 0)*w, _flat(E, 1)*w
+    Hx, Hy = np.conj(_flat(H, 0)), np.conj(_flat(H, 1))
+    return Ex @ np.swapaxes(Hy, -1, -2) - Ey @ np.swapaxes(Hx, -1, -2)
+
+def _flat(F, k):  # component k of (..., M, 3, Nx, Ny) as (..., M, Nx*Ny)
+    return F[..., k, :, :].reshape(F.shape[:-3] + (-1,))
+
+def power_z(E, H, dA):
+    """Re ∫(E x H*)·z dA of each mode of E, H (..., M, 3, Nx, Ny)."""
+    w = np.ravel(dA)
+    return np.real(np.einsum('...k,...k->...', _flat(E, 0)*w, np.conj(_flat(H, 1)))
+        - np.einsum('...k,...k->...', _flat(E, 1)*w, np.conj(_flat(H, 0))))
+
+def overlap_matrix(modes1, modes2, dA=None):
+    """Power-normalized overlaps between every mode of the list modes1 and
+    every mode of the list modes2: shape (M1, M2), or (N, M1, M2) for sweeps
+    over the same N wavelengths.  modes2 is interpolated onto the mesh of
+    modes1 when the meshes differ."""
+    E1, H1 = stack_fields(modes1)
+    E2, H2 = stack_fields(modes2)
+    x1, y1 = modes1[0].xaxis, modes1[0].yaxis
+    x2, y2 = modes2[0].xaxis, modes2[0].yaxis
+    if np.shape(x1) != np.shape(x2) or np.shape(y1) != np.shape(y2) \
+            or not (np.allclose(x1, x2) and np.allclose(y1, y2)):
+        E2, H2 = resample(E2, x2, y2, x1, y1), resample(H2, x2, y2, x1, y1)
+    if dA is None:
+        dA = area_weights(x1, y1)
+    c12 = cross_z_matrix(E1, H2, dA)
+    c21 = np.swapaxes(cross_z_matrix(E2, H1, dA), -1, -2)
+    p1, p2 = power_z(E1, H1, dA), power_z(E2, H2, dA)
+    return np.abs(c12*c21/(p1[..., :, None]*p2[..., None, :]))